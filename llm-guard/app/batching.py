@@ -0,0 +1,203 @@
+"""Dynamic micro-batching for model-backed scanners.
+
+Scans run on executor threads, one request per thread. Without batching each
+thread runs its own forward pass and they all compete for the same cores. The
+batcher funnels concurrent submissions into a single worker thread that
+gathers them for up to ``max_wait_ms`` (or until ``max_batch_size`` texts are
+queued) and scores them in one padded forward pass. It only waits while more
+scans are running on the inference executor than it has gathered, since only
+those can still join; a lone request is scored at once.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import config
+import inference
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class _Submission:  # pylint: disable=too-few-public-methods
+    """Texts from one caller plus the slot its scores are handed back in."""
+
+    __slots__ = ("texts", "done", "scores", "error", "trace", "started")
+
+    def __init__(self, texts: list):
+        """Initialise an unfinished submission for texts."""
+        self.texts = texts
+        self.done = threading.Event()
+        self.scores: list = []
+        self.error: Optional[BaseException] = None
+        # The caller's trace (if sampled) and when its batch started scoring.
+        self.trace = tracing.current()
+        self.started = 0.0
+
+
+class _MicroBatcher:
+    """Gathers concurrent scoring calls into batched forward passes."""
+
+    def __init__(self, score_fn: Callable[[list], list], max_batch_size: int, max_wait_ms: float):
+        """
+        Initialise the batcher.
+
+        Args:
+            score_fn: Scores a list of texts in one call, returning one float per text.
+            max_batch_size: Flush once this many texts are queued. ``<= 1`` disables
+                batching: ``submit`` then calls ``score_fn`` on the caller's thread.
+            max_wait_ms: Max time the first queued text waits for others to join.
+        """
+        self._score_fn = score_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000.0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker_pid = 0
+        self._closed = False
+
+    @classmethod
+    def from_params(cls, score_fn: Callable[[list], list], params: dict) -> "_MicroBatcher":
+        """
+        Build a batcher from a scanner's ``batch_max_size`` and ``batch_max_wait_ms`` params.
+
+        Unset params fall back to config.DEFAULT_BATCH_MAX_SIZE and
+        config.DEFAULT_BATCH_MAX_WAIT_MS; sizes below 1 are raised to 1.
+        """
+        size = params.get("batch_max_size", None)
+        wait_ms = params.get("batch_max_wait_ms", None)
+        return cls(
+            score_fn,
+            max_batch_size=max(1, int(config.DEFAULT_BATCH_MAX_SIZE if size is None else size)),
+            max_wait_ms=float(config.DEFAULT_BATCH_MAX_WAIT_MS if wait_ms is None else wait_ms),
+        )
+
+    @property
+    def max_batch_size(self) -> int:
+        """Most texts scored in one forward pass."""
+        return self._max_batch_size
+
+    @property
+    def enabled(self) -> bool:
+        """True if submissions are batched on a worker thread."""
+        return self._max_batch_size > 1
+
+    def submit(self, texts: list) -> list:
+        """Score texts, sharing a forward pass with concurrent callers; blocks until done."""
+        if not texts:
+            return []
+        if not self.enabled:
+            return self._score_fn(texts)
+        self._ensure_worker()
+        sub = _Submission(texts)
+        submitted = time.monotonic()
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(sub)
+        if closed:
+            # Scored outside the lock so inline callers do not serialise.
+            return self._score_fn(texts)
+        sub.done.wait()
+        tracing.record("batch_wait", submitted, sub.started)
+        if sub.error is not None:
+            raise sub.error
+        return sub.scores
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use (and again in a forked child)."""
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker_pid == pid:
+                return
+            # Threads do not survive fork(); a child inherits the pid marker of
+            # its parent but no worker, so start a fresh queue and thread.
+            self._queue = queue.SimpleQueue()
+            threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+            self._worker_pid = pid
+
+    def close(self):
+        """Stop the worker once queued submissions are scored; later submits run inline."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._worker_pid == os.getpid():
+                # Enqueued under the lock, so it follows every accepted submission.
+                self._queue.put(None)
+
+    def _collect(self) -> tuple:
+        """
+        Block for the first submission, then gather more until full or timed out.
+
+        Waits only while more scans are running on the inference executor
+        than submissions gathered; otherwise takes what is queued at once.
+
+        Returns:
+            tuple: (submissions, closed) where closed is True once close() was
+            reached in the queue.
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self._max_wait
+        while size < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and inference.running() > len(batch):
+                    sub = self._queue.get(timeout=remaining)
+                else:
+                    # Nobody else can join: take what is queued and flush.
+                    sub = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if sub is None:
+                return batch, True
+            batch.append(sub)
+            size += len(sub.texts)
+        return batch, False
+
+    def _run(self):
+        """Worker loop: score each gathered batch and hand every caller its slice."""
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            if not batch:
+                break
+            texts = [t for sub in batch for t in sub.texts]
+            metrics.BATCH_SIZE.observe(len(texts))
+            traced = [sub.trace for sub in batch if sub.trace is not None]
+            started = time.monotonic()
+            for sub in batch:
+                sub.started = started
+            try:
+                # One pass serves several requests: its spans are collected
+                # once and copied into each sampled caller's trace.
+                with tracing.collect(bool(traced)) as collected:
+                    try:
+                        with tracing.span("batch", {"batch_size": len(texts)}):
+                            scores = self._score_fn(texts)
+                    finally:
+                        for trace in traced:
+                            tracing.adopt(trace, collected)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # Surface the failure to every waiting caller instead of killing
+                # the worker and leaving them blocked forever.
+                logger.exception("batched scoring failed", extra={"batch_size": len(texts)})
+                for sub in batch:
+                    sub.error = exc
+                    sub.done.set()
+                continue
+            offset = 0
+            for sub in batch:
+                sub.scores = scores[offset:offset + len(sub.texts)]
+                offset += len(sub.texts)
+                sub.done.set()
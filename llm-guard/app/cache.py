@@ -0,0 +1,125 @@
+"""Bounded verdict cache for the scanner pipeline.
+
+Maps a content hash to the ``(is_safe, scores, blocked_reason, sanitized)``
+tuple the pipeline produced for it, so repeated prompts skip the scanners
+entirely. Keys are digests; the prompt itself is never stored, only the
+redacted copy when a scanner produced one.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key bytes, expiry float,
+# tuple header) added to the payload size when enforcing max_bytes.
+_ENTRY_OVERHEAD = 200
+
+_EVICTION_POLICIES = frozenset({"lru", "fifo"})
+
+
+def _payload_size(value: tuple) -> int:
+    """Approximate the memory held by a cached verdict tuple."""
+    _, scores, reason, sanitized = value
+    size = _ENTRY_OVERHEAD + sys.getsizeof(scores)
+    for name, score in scores.items():
+        size += sys.getsizeof(name) + sys.getsizeof(score)
+    for text in (reason, sanitized):
+        if text is not None:
+            size += sys.getsizeof(text)
+    return size
+
+
+class _VerdictCache:
+    """Thread-safe LRU/FIFO cache with TTL, entry and memory caps."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, eviction: str):
+        """
+        Initialise the cache.
+
+        Args:
+            max_entries: Max cached verdicts; ``0`` disables the cache.
+            max_bytes: Approximate memory cap across all entries; ``0`` means no cap.
+            ttl_seconds: Entry lifetime; ``0`` means entries never expire.
+            eviction: ``"lru"`` (hits refresh recency) or ``"fifo"`` (insertion order).
+        """
+        if eviction not in _EVICTION_POLICIES:
+            raise ValueError(f"Unknown cache eviction policy: {eviction!r}")
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        self._lru = eviction == "lru"
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """True if the cache stores anything."""
+        return self._max_entries > 0
+
+    def get(self, key: bytes) -> Optional[tuple]:
+        """Return the cached verdict for key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, size, expires = entry
+            if expires and expires <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self._expirations += 1
+                self._misses += 1
+                return None
+            if self._lru:
+                self._entries.move_to_end(key)
+            self._hits += 1
+        is_safe, scores, reason, sanitized = value
+        return is_safe, dict(scores), reason, sanitized
+
+    def put(self, key: bytes, value: tuple):
+        """Store a verdict, evicting old entries to stay within the caps."""
+        if not self.enabled:
+            return
+        size = _payload_size(value)
+        expires = time.monotonic() + self._ttl if self._ttl else 0.0
+        is_safe, scores, reason, sanitized = value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = ((is_safe, dict(scores), reason, sanitized), size, expires)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self._max_entries
+                or (self._max_bytes and self._bytes > self._max_bytes)
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self._max_entries,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
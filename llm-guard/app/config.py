@@ -13,8 +13,99 @@ import os
 DEFAULT_MODEL = "protectai/deberta-v3-base-prompt-injection-v2"
 DEFAULT_INJECTION_LABEL = "INJECTION"
 DEFAULT_THRESHOLD = 0.5
+DEFAULT_BATCH_MAX_SIZE = 16
+DEFAULT_BATCH_MAX_WAIT_MS = 5.0
+DEFAULT_WINDOW_OVERLAP = 64
+DEFAULT_WARMUP_LENGTHS = (32, 512)
+DEFAULT_STREAM_OVERLAP = 256
+DEFAULT_SIMILARITY_BLOCK_CUTOFF = 0.9
+DEFAULT_CASCADE_BAND = (0.1, 0.9)
 
 # --- Operational settings (environment-driven) ---
 CONFIG_FILE = os.environ.get("CONFIG_FILE", "")
 LISTEN_HOST = os.environ.get("LISTEN_HOST", "0.0.0.0")
 LISTEN_PORT = int(os.environ.get("LISTEN_PORT", "8080"))
+# Worker processes. >1 loads the pipeline once and forks workers that share
+# the model weights copy-on-write (see prefork.py).
+WORKERS = int(os.environ.get("WORKERS", "1"))
+
+# Inference threading. 0 = derive from the container's cgroup CPU quota so
+# that workers x torch threads stays within the CPUs the pod may use. With
+# micro-batching, forward passes run on each model's single batcher thread,
+# so the derived torch threads are the quota split between the batchers.
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.environ.get("TORCH_INTEROP_THREADS", "0"))
+# Optional CPU list (e.g. "0-3,6") the process is pinned to.
+INFERENCE_CPU_AFFINITY = os.environ.get("INFERENCE_CPU_AFFINITY", "")
+
+# Admission control. At most MAX_QUEUE_DEPTH scans wait for an inference
+# worker (0 = unbounded). REQUEST_TIMEOUT_MS is the default per-request budget
+# (0 = none); a client may send a smaller or larger one in the
+# REQUEST_TIMEOUT_HEADER header. Scans still queued when it expires are dropped.
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "64"))
+REQUEST_TIMEOUT_MS = float(os.environ.get("REQUEST_TIMEOUT_MS", "0"))
+REQUEST_TIMEOUT_HEADER = os.environ.get("REQUEST_TIMEOUT_HEADER", "x-request-timeout-ms")
+# Response when a scan is shed: "reject" (HTTP 429), "fail_open" (allow the
+# prompt unscanned) or "fail_closed" (block it).
+OVERLOAD_POLICY = os.environ.get("OVERLOAD_POLICY", "reject")
+
+# Kernel cache for PromptInjection ``compile: true``. Inductor defaults to
+# /tmp and writes that default back into the environment when torch is
+# imported, so an explicit TORCHINDUCTOR_CACHE_DIR is captured here, before
+# any scanner imports torch; otherwise the cache lives beside the HF models.
+TORCH_COMPILE_CACHE_DIR = os.environ.get("TORCHINDUCTOR_CACHE_DIR") or os.path.join(
+    os.environ.get("HF_HOME") or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"),
+    "torchinductor",
+)
+
+# Bearer token for /admin/* endpoints (config reload, profiling); unset disables them.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# POST /admin/profile: longest capture allowed and stack samples per second.
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "60"))
+PROFILE_SAMPLE_HZ = float(os.environ.get("PROFILE_SAMPLE_HZ", "100"))
+
+# How LiteLLM requests are scanned: "joined" concatenates all user messages
+# into one prompt; "per_message" scans each message as its own unit (batched,
+# cached per message) so only new turns of a conversation cost inference.
+MESSAGE_SCAN_MODE = os.environ.get("MESSAGE_SCAN_MODE", "joined")
+
+# /scan/prompts: max prompts accepted per call, and how many are scanned per
+# pipeline call when streaming NDJSON (bounds memory held per request). When
+# streaming, each chunk gets the request timeout on its own.
+SCAN_BATCH_MAX_PROMPTS = int(os.environ.get("SCAN_BATCH_MAX_PROMPTS", "10000"))
+SCAN_BATCH_CHUNK = int(os.environ.get("SCAN_BATCH_CHUNK", "64"))
+
+# /scan/stream sessions: idle sessions are dropped after the TTL, and at most
+# STREAM_MAX_SESSIONS may be open per worker process. Scanners that judge the
+# whole text keep every chunk until the end, so a session is also closed once
+# more than STREAM_MAX_SESSION_BYTES (UTF-8) were streamed; 0 disables the cap.
+STREAM_SESSION_TTL_SECONDS = float(os.environ.get("STREAM_SESSION_TTL_SECONDS", "300"))
+STREAM_MAX_SESSIONS = int(os.environ.get("STREAM_MAX_SESSIONS", "1000"))
+STREAM_MAX_SESSION_BYTES = int(os.environ.get("STREAM_MAX_SESSION_BYTES", str(1024 * 1024)))
+
+# Logging (see logs.py). Records are written as JSON lines to stderr by a
+# background thread; at most LOG_QUEUE_SIZE wait for it and further records
+# are dropped (counted in metrics) rather than blocking a request.
+# LOG_SAMPLE_RATES thins successful per-request logs, e.g. "/=0.1,*=1": the
+# fraction kept for each request path, with "*" for paths not listed.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+
+# Request tracing (see tracing.py). A TRACE_SAMPLE_RATE fraction of requests
+# (0 = off, 1 = all) collect timing spans, returned in a Server-Timing header.
+# TRACE_EXPORTER "file" appends them as OpenTelemetry JSON lines to TRACE_FILE;
+# "otlp" sends them to the collector set by OTEL_EXPORTER_OTLP_ENDPOINT. Both
+# need the OpenTelemetry SDK installed, which the image does not include.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none")
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "llm-guard")
+
+# Verdict cache: repeated prompts return the cached pipeline verdict without
+# running the scanners. VERDICT_CACHE_MAX_ENTRIES=0 disables it.
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get("VERDICT_CACHE_MAX_ENTRIES", "10000"))
+VERDICT_CACHE_MAX_BYTES = int(os.environ.get("VERDICT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+VERDICT_CACHE_TTL_SECONDS = float(os.environ.get("VERDICT_CACHE_TTL_SECONDS", "3600"))
+VERDICT_CACHE_EVICTION = os.environ.get("VERDICT_CACHE_EVICTION", "lru")
@@ -0,0 +1,334 @@
+"""Dedicated executor for scanner work, sized to the container's CPU quota.
+
+The default asyncio executor runs ``min(32, cpu + 4)`` threads and each one
+drives torch with its own intra-op pool sized to the host's cores, which
+oversubscribes a CPU-limited pod badly. Here the worker count and torch
+thread pools are derived together from the cgroup quota so that
+``workers * torch_threads`` stays within the CPUs the container may use.
+With micro-batching the forward passes run on the batcher threads instead,
+one per batching scanner, so the intra-op pools are sized from the whole
+quota divided between those.
+
+Admission is bounded: at most MAX_QUEUE_DEPTH scans wait for a worker, and a
+scan whose request deadline passes while it waits is dropped before it
+starts, so a burst sheds load instead of queueing work nobody will read.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import config
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+_STATE: dict = {"executor": None, "queued": 0, "running": 0, "batchers": 0}
+_LOCK = threading.Lock()
+
+# Per-request absolute deadline (time.monotonic()) and queue/scan timings,
+# set by request_scope() in the request's task.
+_DEADLINE: contextvars.ContextVar = contextvars.ContextVar("inference_deadline", default=None)
+_TIMINGS: contextvars.ContextVar = contextvars.ContextVar("inference_timings", default=None)
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of running a scan the service cannot take on in time."""
+
+    def __init__(self, reason: str):
+        """Initialise with reason, ``"queue_full"`` or ``"deadline"``."""
+        super().__init__(f"inference overloaded: {reason}")
+        self.reason = reason
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """Return the CPU quota from cgroup v2 ``cpu.max`` or v1 CFS files, if set."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as fh:
+            quota, period = fh.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", encoding="utf-8") as fh:
+            quota = int(fh.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", encoding="utf-8") as fh:
+            period = int(fh.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _parse_cpuset(spec: str) -> set:
+    """Parse a CPU list such as ``"0-3,6"`` into a set of CPU ids."""
+    cpus: set = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def available_cpus() -> int:
+    """Return the usable CPU count: cgroup quota, capped by the affinity mask."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, int(limit)))
+    return max(1, cpus)
+
+
+def intra_op_threads(batched: bool) -> int:
+    """
+    Return the intra-op pool size for a model's forward passes.
+
+    Args:
+        batched: The passes run on a micro-batcher thread. Unbatched passes
+            run on every executor worker at once, so each gets an equal share
+            of the CPUs; batched passes run only on the batcher threads, so
+            the CPUs are shared between the batchers instead.
+    """
+    if config.TORCH_NUM_THREADS:
+        return config.TORCH_NUM_THREADS
+    cpus = available_cpus()
+    if batched:
+        return max(1, cpus // max(1, _STATE["batchers"]))
+    return max(1, cpus // (config.INFERENCE_WORKERS or min(4, cpus)))
+
+
+def thread_budget() -> tuple:
+    """
+    Resolve the (workers, torch_threads, interop_threads) split.
+
+    Unset values are derived from available_cpus(): up to four workers and,
+    for torch's process-wide intra-op pool, intra_op_threads() for batched
+    passes if any scanner batches (see set_batchers()), else for unbatched.
+    """
+    cpus = available_cpus()
+    workers = config.INFERENCE_WORKERS or min(4, cpus)
+    torch_threads = intra_op_threads(_STATE["batchers"] > 0)
+    interop_threads = config.TORCH_INTEROP_THREADS or 1
+    return workers, torch_threads, interop_threads
+
+
+def configure():
+    """Apply thread and affinity settings; call once at startup before any model runs."""
+    if config.INFERENCE_CPU_AFFINITY:
+        # Set on the main thread before any worker exists; executor, batcher
+        # and torch pool threads inherit the mask when they are created.
+        os.sched_setaffinity(0, _parse_cpuset(config.INFERENCE_CPU_AFFINITY))
+    _, torch_threads, interop_threads = thread_budget()
+    # Imported here so the module stays importable without touching torch's
+    # thread pools until configure() is explicitly called.
+    import torch  # pylint: disable=import-outside-toplevel
+
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Only settable once, before any inter-op work has started.
+        logger.warning("torch interop threads already initialised; leaving as is")
+
+
+def set_batchers(count: int):
+    """
+    Resize torch's intra-op pool for a pipeline with count micro-batching models.
+
+    Called by the pipeline once its config is parsed, before models load.
+    """
+    _STATE["batchers"] = count
+    workers, torch_threads, interop_threads = thread_budget()
+    import torch  # pylint: disable=import-outside-toplevel
+
+    torch.set_num_threads(torch_threads)
+    logger.info(
+        "inference threads configured",
+        extra={
+            "cpus": available_cpus(),
+            "workers": workers,
+            "batchers": count,
+            "torch_threads": torch_threads,
+            "interop_threads": interop_threads,
+            "cpu_affinity": config.INFERENCE_CPU_AFFINITY or None,
+        },
+    )
+
+
+def executor() -> ThreadPoolExecutor:
+    """Return the shared inference executor, creating it on first use."""
+    pool = _STATE["executor"]
+    if pool is None:
+        with _LOCK:
+            pool = _STATE["executor"]
+            if pool is None:
+                pool = ThreadPoolExecutor(
+                    max_workers=thread_budget()[0],
+                    thread_name_prefix="inference",
+                )
+                _STATE["executor"] = pool
+    return pool
+
+
+@contextmanager
+def request_scope(timeout_ms: float = 0):
+    """
+    Apply a deadline to every scan run() submits within this scope.
+
+    Args:
+        timeout_ms: Budget from now; ``0`` means no deadline.
+
+    Yields:
+        dict: ``queue_wait`` and ``scan`` seconds, summed over the scope's scans.
+    """
+    timings = {"queue_wait": 0.0, "scan": 0.0}
+    deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms > 0 else None
+    deadline_token = _DEADLINE.set(deadline)
+    timings_token = _TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _DEADLINE.reset(deadline_token)
+        _TIMINGS.reset(timings_token)
+
+
+def _dequeue(ticket: list) -> bool:
+    """
+    Take one scan off the queue count, once per ticket.
+
+    The worker starting the scan and the caller giving up on it both call
+    this; whichever comes first does the decrement.
+
+    Returns:
+        bool: True if this call dequeued the scan.
+    """
+    with _LOCK:
+        if not ticket[0]:
+            return False
+        ticket[0] = False
+        _STATE["queued"] -= 1
+    metrics.EXECUTOR_QUEUED.dec()
+    return True
+
+
+def _tracked(ticket: list, submitted: float, deadline: Optional[float], timings: Optional[dict],
+             fn: Callable, *args):
+    """Run fn on a worker thread unless its deadline passed or its caller left while queued."""
+    started = time.monotonic()
+    if not _dequeue(ticket):
+        # The awaiting task was cancelled; nobody will read the result.
+        return None
+    wait = started - submitted
+    metrics.EXECUTOR_QUEUE_WAIT.observe(wait)
+    tracing.record("queue", submitted, started)
+    if deadline is not None and started >= deadline:
+        metrics.EXECUTOR_REJECTED.labels("deadline").inc()
+        raise Overloaded("deadline")
+    metrics.EXECUTOR_IN_FLIGHT.inc()
+    with _LOCK:
+        _STATE["running"] += 1
+    try:
+        with tracing.span("scan"):
+            return fn(*args)
+    finally:
+        with _LOCK:
+            _STATE["running"] -= 1
+        metrics.EXECUTOR_IN_FLIGHT.dec()
+        elapsed = time.monotonic() - started
+        metrics.EXECUTOR_RUN.observe(elapsed)
+        if timings is not None:
+            # Concurrent stages of one request overlap, so these are summed
+            # worker time rather than wall time.
+            timings["queue_wait"] += wait
+            timings["scan"] += elapsed
+
+
+async def run(fn: Callable, *args):
+    """
+    Run fn(*args) on the inference executor and await its result.
+
+    Raises:
+        Overloaded: The queue is full or the request deadline has passed;
+            fn was not run.
+    """
+    deadline = _DEADLINE.get()
+    submitted = time.monotonic()
+    if deadline is not None and submitted >= deadline:
+        metrics.EXECUTOR_REJECTED.labels("deadline").inc()
+        raise Overloaded("deadline")
+    with _LOCK:
+        if config.MAX_QUEUE_DEPTH and _STATE["queued"] >= config.MAX_QUEUE_DEPTH:
+            full = True
+        else:
+            full = False
+            _STATE["queued"] += 1
+    if full:
+        metrics.EXECUTOR_REJECTED.labels("queue_full").inc()
+        raise Overloaded("queue_full")
+    metrics.EXECUTOR_QUEUED.inc()
+    # [still queued]; cleared by whichever of the worker or this task dequeues first.
+    ticket = [True]
+    loop = asyncio.get_running_loop()
+    # The worker runs fn in a copy of this context so its spans join the
+    # request's trace.
+    context = contextvars.copy_context()
+    try:
+        future = loop.run_in_executor(
+            executor(), context.run,
+            _tracked, ticket, submitted, deadline, _TIMINGS.get(), fn, *args,
+        )
+        return await future
+    finally:
+        # Cancelled while still queued (client disconnect, a failed gather):
+        # release the slot now and the worker skips fn when it gets there.
+        _dequeue(ticket)
+
+
+async def gather(*coros) -> list:
+    """
+    Await coros concurrently and return their results in order.
+
+    Unlike asyncio.gather, the first exception (e.g. Overloaded) cancels the
+    remaining awaitables before it propagates, so their still-queued scans
+    release their slots instead of running for a request that has failed.
+    """
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Let the cancellations land before the error reaches the caller.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def running() -> int:
+    """Return how many scans are running on the inference executor right now."""
+    return _STATE["running"]
+
+
+def shutdown():
+    """Stop the executor, waiting for in-flight scans to finish."""
+    with _LOCK:
+        pool = _STATE["executor"]
+        _STATE["executor"] = None
+    if pool is not None:
+        pool.shutdown(wait=True)
@@ -0,0 +1,181 @@
+"""Structured JSON logging, written off the request path.
+
+Every record becomes one JSON object per line on stderr: ``time``, ``level``,
+``logger``, ``msg``, any ``extra=`` fields and, for exceptions, ``exc``.
+Callers only enqueue the record; a background QueueListener thread formats
+and writes it, so a slow stderr never stalls the event loop or an inference
+worker. The queue is bounded by LOG_QUEUE_SIZE and records arriving when it
+is full are dropped and counted rather than waited on.
+
+Per-request success logs can be thinned with LOG_SAMPLE_RATES. A record is
+eligible when it carries a ``route`` extra (the request path) and is below
+WARNING, not a block (``is_safe`` False) and not an error status; uvicorn's
+access log lines are eligible the same way. Everything else is always kept.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+import config
+import metrics
+
+# Attributes every LogRecord has; anything else on a record came from extra=.
+# uvicorn adds color_message, an ANSI-coloured copy of msg.
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "color_message",
+}
+
+_STATE: dict = {"handler": None, "listener": None}
+
+
+class _JsonFormatter(logging.Formatter):
+    """Formats a record and its extra fields as a single JSON line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Return record as JSON; values json cannot encode are written with str()."""
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        elif record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def _parse_rates(spec: str) -> dict:
+    """Parse ``"/=0.1,*=1"`` into ``{path: keep fraction}``."""
+    rates: dict = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        path, sep, value = part.rpartition("=")
+        if not sep or not path:
+            raise ValueError(f"LOG_SAMPLE_RATES entry must be <path>=<rate>, got {part!r}")
+        rate = float(value)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(
+                f"LOG_SAMPLE_RATES rate for {path!r} must be within [0, 1], got {rate}"
+            )
+        rates[path] = rate
+    return rates
+
+
+class _SuccessSampler(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Keeps a LOG_SAMPLE_RATES fraction of successful per-request log records."""
+
+    def __init__(self, rates: dict):
+        """Initialise with ``{path: keep fraction}``; ``"*"`` covers unlisted paths."""
+        super().__init__()
+        self._rates = rates
+        self._default = rates.get("*", 1.0)
+
+    @staticmethod
+    def _route(record: logging.LogRecord) -> Optional[tuple]:
+        """Return (path, status) if record is a per-request log, else None."""
+        route = getattr(record, "route", None)
+        if route is not None:
+            return route, getattr(record, "status", 200)
+        args = record.args
+        if record.name == "uvicorn.access" and isinstance(args, tuple) and len(args) == 5:
+            # uvicorn formats (client, method, path with query, http version, status).
+            return str(args[2]).partition("?")[0], args[4]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return False to drop a sampled-out success record."""
+        if record.levelno >= logging.WARNING or getattr(record, "is_safe", True) is False:
+            return True
+        route = self._route(record)
+        if route is None:
+            return True
+        path, status = route
+        if isinstance(status, int) and status >= 400:
+            return True
+        rate = self._rates.get(path, self._default)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        metrics.LOG_RECORDS_SAMPLED_OUT.inc()
+        return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Resolve the message and traceback now; JSON encoding is left to the listener.
+
+        Extra values are passed by reference, so callers must not mutate them
+        after logging (dicts built for the call, as everywhere here, are fine).
+        """
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """Queue record, or count it as dropped if the writer is behind."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+def _start_listener():
+    """Start a background writer draining the handler's queue to stderr."""
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(_JsonFormatter())
+    listener = logging.handlers.QueueListener(_STATE["handler"].queue, stream)
+    listener.start()
+    _STATE["listener"] = listener
+
+
+def _restart_in_child():
+    """Give a forked child its own queue and writer; threads do not survive fork()."""
+    if _STATE["handler"] is not None:
+        _STATE["handler"].queue = queue.Queue(config.LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def configure():
+    """Route all logging through the JSON queue handler; call once at startup."""
+    if _STATE["handler"] is not None:
+        return
+    handler = _DroppingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    rates = _parse_rates(config.LOG_SAMPLE_RATES)
+    if rates:
+        handler.addFilter(_SuccessSampler(rates))
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config.LOG_LEVEL)
+    _STATE["handler"] = handler
+    _start_listener()
+    os.register_at_fork(after_in_child=_restart_in_child)
+    atexit.register(stop)
+
+
+def stop():
+    """Write out every queued record and stop the writer; call before os._exit()."""
+    listener = _STATE["listener"]
+    _STATE["listener"] = None
+    if listener is not None:
+        listener.stop()
@@ -1,35 +1,166 @@
 """FastAPI service: LiteLLM guardrail and llm-guard-api compatible endpoints."""
 import asyncio
+import hmac
+import json
 import logging
+import os
+import signal
+import time
 from contextlib import asynccontextmanager
 from typing import Optional
 
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 import config
+import inference
+import logs
+import metrics
 import pipeline
+import prefork
+import profiler
+import streaming
+import tracing
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='{"time":"%(asctime)s","level":"%(levelname)s","msg":"%(message)s"}',
-)
+logs.configure()
 logger = logging.getLogger(__name__)
 
 _STATE = {"ready": False}
+_OVERLOAD_POLICIES = frozenset({"reject", "fail_open", "fail_closed"})
+_MESSAGE_SCAN_MODES = frozenset({"joined", "per_message"})
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    """Load scanner resources at startup and mark the service ready."""
-    pipeline.load()
+    """Load and warm up scanner resources at startup, then mark the service ready.
+
+    Forked workers inherit a pipeline the master already loaded and only
+    warm it up before marking themselves ready.
+    """
+    if config.OVERLOAD_POLICY not in _OVERLOAD_POLICIES:
+        raise ValueError(f"Unknown OVERLOAD_POLICY: {config.OVERLOAD_POLICY!r}")
+    if config.MESSAGE_SCAN_MODE not in _MESSAGE_SCAN_MODES:
+        raise ValueError(f"Unknown MESSAGE_SCAN_MODE: {config.MESSAGE_SCAN_MODE!r}")
+    # Per worker: the exporter's background thread does not survive fork.
+    tracing.setup()
+    if not pipeline.loaded():
+        _preload()
+    if pipeline.stale():
+        # A worker restarted after a reload: the master's copy predates it.
+        # reload() warms the new pipeline itself.
+        pipeline.reload()
+    else:
+        # Warmup runs here rather than in _preload so that with WORKERS>1 it
+        # happens in each worker: the master must not start torch's pools.
+        pipeline.warmup()
+    _install_reload_signal()
     _STATE["ready"] = True
+    prefork.mark_ready()
     yield
+    prefork.mark_ready(False)
+    inference.shutdown()
+    tracing.shutdown()
+
+
+def _preload():
+    """Configure inference threads and load the scanner pipeline."""
+    inference.configure()
+    pipeline.load()
+
+
+def _install_reload_signal():
+    """Reload the pipeline on SIGHUP, where the event loop can take signals."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(_reload())
+        )
+    except (ValueError, RuntimeError, NotImplementedError):
+        # Loop not in the main thread (embedded / test servers): admin endpoint only.
+        logger.warning("SIGHUP reload unavailable; use POST /admin/reload")
+
+
+async def _reload() -> Optional[str]:
+    """Reload the pipeline off the event loop; return the error message on failure."""
+    try:
+        await asyncio.to_thread(pipeline.reload)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logger.exception("pipeline reload failed; keeping current config")
+        return str(exc)
+    return None
+
+
+class _RequestMetrics:  # pylint: disable=too-few-public-methods
+    """ASGI middleware recording request latency per matched route template.
+
+    Labelled by the route's path template (not the raw path) to keep label
+    cardinality bounded; unmatched paths share a single label.
+    """
+
+    def __init__(self, asgi_app):
+        """Wrap asgi_app."""
+        self._app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        """Time HTTP requests; pass other scopes straight through."""
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self._app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            metrics.REQUEST_LATENCY.labels(
+                getattr(route, "path", "unmatched"), scope["method"]
+            ).observe(time.perf_counter() - start)
+
+
+class _RequestTracing:  # pylint: disable=too-few-public-methods
+    """ASGI middleware tracing sampled requests (see tracing.py).
+
+    A sampled response carries a ``Server-Timing`` header with the time spent
+    in each stage so far; the full span tree is exported after it completes.
+    """
+
+    def __init__(self, asgi_app):
+        """Wrap asgi_app."""
+        self._app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        """Trace sampled HTTP requests; pass everything else straight through."""
+        trace = tracing.begin() if scope["type"] == "http" else None
+        if trace is None:
+            await self._app(scope, receive, send)
+            return
+
+        attributes = {"http.method": scope["method"]}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                attributes["http.status_code"] = message["status"]
+                timing = tracing.server_timing(trace)
+                if timing:
+                    message["headers"] = [
+                        *message.get("headers", []), (b"server-timing", timing.encode("latin-1"))
+                    ]
+            await send(message)
+
+        with tracing.request(trace, "request", attributes):
+            try:
+                await self._app(scope, receive, send_with_timing)
+            finally:
+                attributes["http.route"] = getattr(scope.get("route"), "path", "unmatched")
+        if trace.spans:
+            # Only kept while exporting; building the SDK spans is kept off the event loop.
+            await asyncio.to_thread(tracing.export, trace)
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(_RequestMetrics)
+app.add_middleware(_RequestTracing)
+metrics.register_collector(pipeline.cache_stats)
 
 
 @app.get("/healthz")
@@ -40,12 +171,100 @@ def healthz():
 
 @app.get("/readyz")
 def readyz():
-    """Return readiness status; 503 until model is loaded."""
+    """Return readiness status; 503 until model is loaded (in every worker)."""
+    if prefork.active():
+        ready, total = prefork.readiness()
+        body = {"workers_ready": ready, "workers": total}
+        if ready < total:
+            return JSONResponse(status_code=503, content={"status": "not ready", **body})
+        return {"status": "ok", **body}
     if not _STATE["ready"]:
         return JSONResponse(status_code=503, content={"status": "not ready"})
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics_endpoint():
+    """Expose Prometheus metrics."""
+    payload, content_type = metrics.render()
+    return Response(content=payload, media_type=content_type)
+
+
+def _admin_denied(request: Request) -> Optional[JSONResponse]:
+    """Return an error response unless the request carries the ADMIN_TOKEN bearer token.
+
+    Admin endpoints do not exist (404) while ADMIN_TOKEN is unset.
+    """
+    if not config.ADMIN_TOKEN:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    scheme, _, supplied = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        supplied.encode("utf-8"), config.ADMIN_TOKEN.encode("utf-8")
+    ):
+        return JSONResponse(status_code=401, content={"detail": "invalid admin token"})
+    return None
+
+
+@app.get("/cache/stats")
+def cache_stats(request: Request):
+    """
+    Return verdict cache hit/miss/eviction counters for sizing the cache.
+
+    Needs ADMIN_TOKEN like the /admin endpoints; the same counters are
+    exported on /metrics.
+    """
+    denied = _admin_denied(request)
+    if denied is not None:
+        return denied
+    return pipeline.cache_stats()
+
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    """
+    Reload CONFIG_FILE, reusing loaded models whose params are unchanged.
+
+    With WORKERS>1 the master is sent SIGHUP and reloads every worker
+    asynchronously (202); otherwise the reload completes before responding.
+    """
+    denied = _admin_denied(request)
+    if denied is not None:
+        return denied
+    if prefork.active():
+        os.kill(os.getppid(), signal.SIGHUP)
+        return JSONResponse(status_code=202, content={"status": "reload signalled"})
+    error = await _reload()
+    if error is not None:
+        return JSONResponse(status_code=500, content={"status": "failed", "detail": error})
+    return {"status": "reloaded"}
+
+
+@app.post("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10.0, forward_passes: int = 10):
+    """
+    Profile this worker for ``seconds`` and return the artifacts as a zip.
+
+    The archive holds a collapsed-stack CPU profile of every thread and a
+    torch profiler trace for each of the next ``forward_passes`` model
+    forward passes (see profiler.py). With WORKERS>1 only the worker that
+    serves the request is profiled; its pid is in ``profile.json``.
+    409 while another capture is running.
+    """
+    denied = _admin_denied(request)
+    if denied is not None:
+        return denied
+    try:
+        archive = await asyncio.to_thread(profiler.capture, seconds, forward_passes)
+    except RuntimeError as exc:
+        return JSONResponse(status_code=409, content={"detail": str(exc)})
+    filename = f"llm-guard-profile-{os.getpid()}-{int(time.time())}.zip"
+    return Response(
+        content=archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 # --- LiteLLM guardrail format ---
 
 class _StructuredMsg(BaseModel):
@@ -93,14 +312,74 @@ def _extract_prompt(req: LiteLLMRequest) -> str:
     return "\n".join(parts)
 
 
+def _extract_messages(req: LiteLLMRequest) -> list:
+    """Return ``(index, text)`` for each non-empty text / user message of a request.
+
+    The index is the position in ``texts`` or ``structured_messages`` so a
+    block can be traced back to the message that caused it.
+    """
+    if req.texts:
+        return [(i, t) for i, t in enumerate(req.texts) if t]
+    return [
+        (i, text)
+        for i, m in enumerate(req.structured_messages or [])
+        if m.role == "user" and (text := m.text())
+    ]
+
+
 def _safe_id(value: Optional[str]) -> str:
     """Strip newlines to prevent log injection; treat None as empty."""
     return (value or "").replace("\n", " ").replace("\r", " ")
 
 
+def _timeout_ms(request: Request) -> float:
+    """Return the request's scan budget: a valid timeout header, else the default."""
+    raw = request.headers.get(config.REQUEST_TIMEOUT_HEADER)
+    if raw:
+        try:
+            value = float(raw)
+        except ValueError:
+            value = 0.0
+        if value > 0:
+            return value
+    return config.REQUEST_TIMEOUT_MS
+
+
+def _shed(exc: inference.Overloaded, allowed: dict, blocked: dict):
+    """Answer a request whose scan was shed, according to OVERLOAD_POLICY."""
+    logger.warning("scan shed", extra={"reason": exc.reason, "policy": config.OVERLOAD_POLICY})
+    if config.OVERLOAD_POLICY == "fail_open":
+        return allowed
+    if config.OVERLOAD_POLICY == "fail_closed":
+        return blocked
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+async def _scan_litellm(req: LiteLLMRequest) -> Optional[tuple]:
+    """Scan a LiteLLM request; return (is_safe, scores, reason, blocked_index) or None if empty."""
+    if config.MESSAGE_SCAN_MODE == "per_message":
+        with tracing.span("extract"):
+            messages = _extract_messages(req)
+        if not messages:
+            return None
+        verdicts = await pipeline.scan_many_async([text for _, text in messages])
+        is_safe, scores, reason, blocked = pipeline.merge_verdicts(verdicts)
+        if blocked is None:
+            return is_safe, scores, reason, None
+        blocked_index = messages[blocked][0]
+        reason = f"message {blocked_index}: {reason or 'content blocked'}"
+        return is_safe, scores, reason, blocked_index
+    with tracing.span("extract"):
+        prompt = _extract_prompt(req)
+    if not prompt:
+        return None
+    is_safe, scores, reason, _ = await pipeline.scan_async(prompt)
+    return is_safe, scores, reason, None
+
+
 @app.post("/")
 @app.post("/beta/litellm_basic_guardrail_api")
-async def litellm_guardrail(req: LiteLLMRequest):
+async def litellm_guardrail(req: LiteLLMRequest, request: Request):
     """
     Evaluate a LiteLLM request for prompt injection.
 
@@ -108,19 +387,31 @@ async def litellm_guardrail(req: LiteLLMRequest):
         dict: ``{"action": "BLOCKED", "blocked_reason": "..."}`` if unsafe,
               ``{"action": "NONE"}`` otherwise.
     """
-    prompt = _extract_prompt(req)
-    if not prompt:
+    # Everything before the handler runs: routing, body read and validation.
+    tracing.since_start("parse")
+    with inference.request_scope(_timeout_ms(request)) as timings:
+        try:
+            result = await _scan_litellm(req)
+        except inference.Overloaded as exc:
+            return _shed(
+                exc,
+                allowed={"action": "NONE"},
+                blocked={"action": "BLOCKED", "blocked_reason": "guardrail overloaded"},
+            )
+    if result is None:
         return {"action": "NONE"}
-
-    loop = asyncio.get_running_loop()
-    is_safe, scores, reason = await loop.run_in_executor(None, pipeline.scan, prompt)
+    is_safe, scores, reason, blocked_index = result
 
     logger.info(
         "litellm scan",
         extra={
+            "route": request.url.path,
             "call_id": _safe_id(req.litellm_call_id),
             "is_safe": is_safe,
             "scores": scores,
+            "blocked_message": blocked_index,
+            "queue_wait_ms": round(timings["queue_wait"] * 1000, 3),
+            "scan_ms": round(timings["scan"] * 1000, 3),
         },
     )
 
@@ -140,23 +431,185 @@ class ScanPromptRequest(BaseModel):
     prompt: str
 
 
+class ScanPromptsRequest(BaseModel):
+    """Request body for the batch scan endpoint."""
+
+    prompts: list[str]
+    stream: bool = False
+
+
+def _prompt_result(prompt: str, verdict: tuple) -> dict:
+    """Shape a pipeline verdict as an llm-guard-api result."""
+    is_safe, scores, _, sanitized = verdict
+    return {
+        "is_valid": is_safe,
+        "sanitized_prompt": prompt if sanitized is None else sanitized,
+        "scanners": scores,
+    }
+
+
+def _shed_result(prompt: str, is_valid: bool) -> dict:
+    """Result for a prompt that was not scanned because the service was overloaded."""
+    return {"is_valid": is_valid, "sanitized_prompt": prompt, "scanners": {}}
+
+
 @app.post("/analyze/prompt")
 @app.post("/scan/prompt")
-async def scan_prompt(req: ScanPromptRequest):
+async def scan_prompt(req: ScanPromptRequest, request: Request):
     """
     Scan a prompt; returns an llm-guard-api compatible result.
 
     Returns:
         dict: ``{"is_valid": bool, "sanitized_prompt": str, "scanners": {...}}``
     """
-    loop = asyncio.get_running_loop()
-    is_safe, scores, _ = await loop.run_in_executor(None, pipeline.scan, req.prompt)
-    return {
-        "is_valid": is_safe,
-        "sanitized_prompt": req.prompt,
-        "scanners": scores,
-    }
+    tracing.since_start("parse")
+    with inference.request_scope(_timeout_ms(request)):
+        try:
+            verdict = await pipeline.scan_async(req.prompt)
+        except inference.Overloaded as exc:
+            return _shed(
+                exc,
+                allowed=_shed_result(req.prompt, True),
+                blocked=_shed_result(req.prompt, False),
+            )
+    return _prompt_result(req.prompt, verdict)
+
+
+async def _stream_results(prompts: list, timeout_ms: float):
+    """Yield one NDJSON line per prompt, scanning SCAN_BATCH_CHUNK prompts at a time.
+
+    Each chunk gets its own timeout_ms budget: results are sent as they are
+    ready, so a long batch is bounded per chunk rather than shed wholesale
+    once its total run time passes one request's budget.
+
+    Once the response has started an overload can no longer become a 429, so
+    under the "reject" policy the stream ends with an ``error`` line instead.
+    """
+    for start in range(0, len(prompts), config.SCAN_BATCH_CHUNK):
+        chunk = prompts[start:start + config.SCAN_BATCH_CHUNK]
+        with inference.request_scope(timeout_ms):
+            try:
+                verdicts = await pipeline.scan_many_async(chunk)
+                results = [_prompt_result(p, v) for p, v in zip(chunk, verdicts)]
+            except inference.Overloaded as exc:
+                logger.warning(
+                    "scan shed", extra={"reason": exc.reason, "policy": config.OVERLOAD_POLICY}
+                )
+                if config.OVERLOAD_POLICY == "reject":
+                    yield json.dumps({"index": start, "error": str(exc)}) + "\n"
+                    return
+                results = [_shed_result(p, config.OVERLOAD_POLICY == "fail_open") for p in chunk]
+        for offset, result in enumerate(results):
+            yield json.dumps({"index": start + offset, **result}) + "\n"
+
+
+@app.post("/scan/prompts")
+async def scan_prompts(req: ScanPromptsRequest, request: Request):
+    """
+    Scan many prompts in one call, sharing batched forward passes between them.
+
+    Returns:
+        dict: ``{"results": [...]}`` with one llm-guard-api result per prompt,
+        in input order; with ``stream`` an ``application/x-ndjson`` body with
+        one ``{"index": i, ...result}`` line per prompt instead.
+    """
+    tracing.since_start("parse")
+    if len(req.prompts) > config.SCAN_BATCH_MAX_PROMPTS:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"at most {config.SCAN_BATCH_MAX_PROMPTS} prompts per request"},
+        )
+    if req.stream:
+        return StreamingResponse(
+            _stream_results(req.prompts, _timeout_ms(request)), media_type="application/x-ndjson"
+        )
+    with inference.request_scope(_timeout_ms(request)):
+        try:
+            verdicts = await pipeline.scan_many_async(req.prompts) if req.prompts else []
+        except inference.Overloaded as exc:
+            return _shed(
+                exc,
+                allowed={"results": [_shed_result(p, True) for p in req.prompts]},
+                blocked={"results": [_shed_result(p, False) for p in req.prompts]},
+            )
+    return {"results": [_prompt_result(p, v) for p, v in zip(req.prompts, verdicts)]}
+
+
+# --- Streamed output scanning ---
+
+class StreamChunkRequest(BaseModel):
+    """One chunk of a streamed text; ``final`` ends the stream."""
+
+    chunk: str = ""
+    final: bool = False
+
+
+@app.post("/scan/stream")
+def open_stream():
+    """
+    Open a streaming scan session.
+
+    Returns:
+        dict: ``{"session_id": str}``; 429 if too many sessions are open.
+    """
+    session_id = streaming.open_session()
+    if session_id is None:
+        return JSONResponse(status_code=429, content={"detail": "too many open stream sessions"})
+    return {"session_id": session_id}
+
+
+@app.post("/scan/stream/{session_id}")
+async def scan_stream_chunk(session_id: str, req: StreamChunkRequest, request: Request):
+    """
+    Scan the next chunk of a stream.
+
+    Returns:
+        dict: ``{"is_valid", "scanners", "blocked_reason", "done"}`` for all text
+        streamed so far. A block ends the session (``done``); stop relaying the
+        stream. 404 for unknown, expired or finished sessions; 413 (and the
+        session is closed) once more than STREAM_MAX_SESSION_BYTES were streamed.
+    """
+    tracing.since_start("parse")
+    with inference.request_scope(_timeout_ms(request)):
+        try:
+            is_safe, scores, reason, done = await inference.run(
+                streaming.feed, session_id, req.chunk, req.final
+            )
+        except KeyError:
+            return JSONResponse(status_code=404, content={"detail": "unknown stream session"})
+        except streaming.SessionTooLarge as exc:
+            return JSONResponse(status_code=413, content={"detail": str(exc)})
+        except inference.Overloaded as exc:
+            # The chunk was not scanned; under "reject" the client may resend it.
+            # Otherwise a blocked or final chunk ends the session, as when scanned.
+            if config.OVERLOAD_POLICY == "fail_closed" or (
+                config.OVERLOAD_POLICY == "fail_open" and req.final
+            ):
+                streaming.close(session_id)
+            return _shed(
+                exc,
+                allowed={
+                    "is_valid": True, "scanners": {}, "blocked_reason": None, "done": req.final,
+                },
+                blocked={
+                    "is_valid": False, "scanners": {}, "blocked_reason": "guardrail overloaded",
+                    "done": True,
+                },
+            )
+    return {"is_valid": is_safe, "scanners": scores, "blocked_reason": reason, "done": done}
+
+
+@app.delete("/scan/stream/{session_id}")
+def close_stream(session_id: str):
+    """Discard a stream session without a final verdict."""
+    if not streaming.close(session_id):
+        return JSONResponse(status_code=404, content={"detail": "unknown stream session"})
+    return {"status": "closed"}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=config.LISTEN_HOST, port=config.LISTEN_PORT)
+    if config.WORKERS > 1:
+        prefork.serve(app, config.LISTEN_HOST, config.LISTEN_PORT, config.WORKERS, preload=_preload)
+    else:
+        # log_config=None keeps uvicorn's own loggers on the JSON queue handler.
+        uvicorn.run(app, host=config.LISTEN_HOST, port=config.LISTEN_PORT, log_config=None)
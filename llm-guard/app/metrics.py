@@ -0,0 +1,154 @@
+"""Prometheus metrics.
+
+Hot-path updates are plain ``observe``/``inc`` calls on pre-bound label
+children (a lock and a few float ops each), so collecting them costs
+microseconds per request. Values that already live elsewhere, such as the
+verdict cache counters, are read at scrape time by a collector instead.
+
+With WORKERS>1 set PROMETHEUS_MULTIPROC_DIR to an empty writable directory so
+every worker's samples are aggregated into one scrape; prometheus_client
+reads it at import, so it must be set in the environment before start.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+_MULTIPROC = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Scans take from microseconds (cached, regex) to seconds (long prompts on CPU).
+_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "llm_guard_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["route", "method"],
+    buckets=_LATENCY_BUCKETS,
+)
+SCANNER_LATENCY = Histogram(
+    "llm_guard_scanner_duration_seconds",
+    "Latency of one scanner call (a single text or a batch) within a pipeline scan.",
+    ["scanner"],
+    buckets=_LATENCY_BUCKETS,
+)
+SCANNER_RESULTS = Counter(
+    "llm_guard_scanner_results_total",
+    "Texts evaluated by each scanner, by outcome; block rate = blocked / total.",
+    ["scanner", "result"],
+)
+EXECUTOR_QUEUED = Gauge(
+    "llm_guard_executor_queue_depth",
+    "Scans submitted to the inference executor and not yet started.",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "llm_guard_executor_in_flight",
+    "Scans currently running on the inference executor.",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "llm_guard_executor_queue_wait_seconds",
+    "Time a scan waited for an inference worker.",
+    buckets=_LATENCY_BUCKETS,
+)
+EXECUTOR_RUN = Histogram(
+    "llm_guard_executor_run_seconds",
+    "Time a scan ran on an inference worker, excluding queue wait.",
+    buckets=_LATENCY_BUCKETS,
+)
+EXECUTOR_REJECTED = Counter(
+    "llm_guard_executor_rejected_total",
+    "Scans not run because the queue was full or the request deadline had passed.",
+    ["reason"],
+)
+CASCADE_DECISIONS = Counter(
+    "llm_guard_cascade_decisions_total",
+    "Texts decided by each stage of a PromptInjection cascade; large = escalated.",
+    ["stage"],
+)
+BATCH_SIZE = Histogram(
+    "llm_guard_batch_size",
+    "Texts per batched forward pass in the micro-batcher.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "llm_guard_log_records_dropped_total",
+    "Log records dropped because the background log writer's queue was full.",
+)
+LOG_RECORDS_SAMPLED_OUT = Counter(
+    "llm_guard_log_records_sampled_out_total",
+    "Successful request log records skipped by LOG_SAMPLE_RATES.",
+)
+
+
+def scanner_result(scanner: str, is_safe: bool):
+    """Count one scanned text for scanner."""
+    SCANNER_RESULTS.labels(scanner, "safe" if is_safe else "blocked").inc()
+
+
+class _CacheCollector:  # pylint: disable=too-few-public-methods
+    """Exposes the verdict cache counters, read only when scraped."""
+
+    def __init__(self, stats):
+        """Initialise with a zero-argument callable returning cache stats."""
+        self._stats = stats
+
+    def collect(self):
+        """Yield cache counters and size gauges."""
+        stats = self._stats()
+        for name in ("hits", "misses", "evictions", "expirations"):
+            yield CounterMetricFamily(
+                f"llm_guard_verdict_cache_{name}", f"Verdict cache {name}.", value=stats[name]
+            )
+        yield GaugeMetricFamily(
+            "llm_guard_verdict_cache_entries", "Cached verdicts.", value=stats["entries"]
+        )
+        yield GaugeMetricFamily(
+            "llm_guard_verdict_cache_bytes", "Approximate cache size.", value=stats["bytes"]
+        )
+
+
+_EXTRA_COLLECTORS: list = []
+
+
+def register_collector(stats):
+    """Expose cache stats (a callable) on /metrics.
+
+    In multiprocess mode this reflects only the worker that serves the scrape.
+    """
+    collector = _CacheCollector(stats)
+    _EXTRA_COLLECTORS.append(collector)
+    if not _MULTIPROC:
+        REGISTRY.register(collector)
+
+
+def render() -> tuple:
+    """Return (payload, content_type) for the /metrics endpoint."""
+    if not _MULTIPROC:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    # Imported here: the multiprocess module is only needed when aggregating.
+    from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _EXTRA_COLLECTORS:
+        registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges from the multiprocess directory."""
+    if _MULTIPROC:
+        from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,69 @@
+"""Normalized views of a prompt, computed once per scan and shared by scanners.
+
+Each scanner entry in CONFIG_FILE may set ``view`` to choose the text it
+reads:
+
+* ``raw``: the prompt as received (default).
+* ``nfkc``: Unicode NFKC, which folds width and compatibility variants
+  such as fullwidth ``ｉｇｎｏｒｅ`` or mathematical ``𝐢𝐠𝐧𝐨𝐫𝐞`` to
+  ``ignore``. Cross-script lookalikes (Cyrillic ``а`` for Latin ``a``) are
+  not compatibility variants and are left as they are.
+* ``stripped``: ``nfkc`` with invisible format characters removed (the set
+  InvisibleText detects), so zero-width characters cannot split a keyword.
+* ``casefold``: ``stripped``, case-folded.
+
+Views build on each other and are computed on first use, so a prompt costs
+one pass per distinct view its scanners ask for, and nothing when every
+scanner reads ``raw``.
+"""
+import unicodedata
+
+from scanner_types import invisible_pattern
+
+VIEWS = ("raw", "nfkc", "stripped", "casefold")
+
+
+class TextViews:
+    """Lazily computed views of one prompt."""
+
+    __slots__ = ("raw", "_nfkc", "_stripped", "_casefold")
+
+    def __init__(self, raw: str):
+        """Initialise with the prompt as received; no view is computed yet."""
+        self.raw = raw
+        self._nfkc = None
+        self._stripped = None
+        self._casefold = None
+
+    def get(self, view: str) -> str:
+        """Return the named view of the prompt, computing it (and its inputs) once."""
+        if view == "raw":
+            return self.raw
+        if view == "nfkc":
+            return self.nfkc()
+        if view == "stripped":
+            return self.stripped()
+        if view == "casefold":
+            return self.casefold()
+        raise ValueError(f"Unknown text view: {view!r}")
+
+    def nfkc(self) -> str:
+        """Return the NFKC-normalized prompt."""
+        if self._nfkc is None:
+            # ASCII is already in NFKC; isascii() is a near-free C check.
+            self._nfkc = self.raw if self.raw.isascii() else unicodedata.normalize("NFKC", self.raw)
+        return self._nfkc
+
+    def stripped(self) -> str:
+        """Return the NFKC prompt without invisible format characters."""
+        if self._stripped is None:
+            text = self.nfkc()
+            self._stripped = text if text.isascii() else invisible_pattern().sub("", text)
+        return self._stripped
+
+    def casefold(self) -> str:
+        """Return the stripped prompt, case-folded."""
+        if self._casefold is None:
+            text = self.stripped()
+            self._casefold = text.lower() if text.isascii() else text.casefold()
+        return self._casefold
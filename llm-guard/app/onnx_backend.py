@@ -0,0 +1,208 @@
+"""ONNX Runtime backend for text-classification scanners.
+
+Exports the configured HuggingFace model to ONNX once, optionally applies
+dynamic int8 quantization, and caches the graph under HF_HOME so later
+starts load it directly. The graph as optimized by ONNX Runtime is cached
+beside it, so later sessions skip graph optimization too.
+``_OnnxClassifier`` is called like the transformers text-classification
+pipeline (``top_k=None``) and returns the same ``[{"label": ..., "score":
+...}, ...]`` lists, so label mapping and threshold semantics match the torch
+backend.
+"""
+import hashlib
+import inspect
+import logging
+import os
+import tempfile
+
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoConfig, AutoTokenizer
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+_OPSET = 17
+
+
+def _cache_dir(model: str, revision: str) -> str:
+    """Return the HF_HOME subdirectory holding exported graphs for a model revision."""
+    hf_home = os.environ.get("HF_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache", "huggingface"
+    )
+    return os.path.join(hf_home, "onnx", model.replace("/", "--"), revision)
+
+
+def _revision(model: str, model_config) -> str:
+    """
+    Return the cache key for the model's current files.
+
+    Hub models are keyed by their commit hash. A local directory has none,
+    so it is keyed by the name, size and mtime of its files: replacing the
+    weights in place exports a fresh graph instead of serving the stale one.
+    """
+    commit = getattr(model_config, "_commit_hash", None)
+    if commit:
+        return commit
+    if not os.path.isdir(model):
+        return "local"
+    stamp = hashlib.sha256()
+    for entry in sorted(os.scandir(model), key=lambda e: e.name):
+        if entry.is_file():
+            st = entry.stat()
+            stamp.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return "local-" + stamp.hexdigest()[:16]
+
+
+def _export(model: str, tokenizer, path: str):
+    """Export model to an ONNX graph at path with dynamic batch and sequence axes."""
+    # Imported here so the ONNX path only pays for torch during a one-off export.
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    logger.info("exporting model to onnx", extra={"model": model, "path": path})
+    torch_model = AutoModelForSequenceClassification.from_pretrained(
+        model, attn_implementation="eager"
+    ).eval()
+    encoded = tokenizer(["export sample"], return_tensors="pt")
+    # Graph inputs are traced in forward() signature order, not dict order;
+    # name them in that order or ORT will feed e.g. token_type_ids as the mask.
+    names = [n for n in inspect.signature(torch_model.forward).parameters if n in encoded]
+    sample = {n: encoded[n] for n in names}
+    fd, tmp = tempfile.mkstemp(suffix=".onnx", dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                torch_model,
+                (sample,),
+                tmp,
+                input_names=names,
+                output_names=["logits"],
+                dynamic_axes={
+                    **{n: {0: "batch", 1: "sequence"} for n in names},
+                    "logits": {0: "batch"},
+                },
+                opset_version=_OPSET,
+                dynamo=False,
+            )
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _quantize(src: str, path: str):
+    """Write a dynamically int8-quantized copy of the graph at src to path."""
+    # pylint: disable=import-outside-toplevel
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info("quantizing onnx model", extra={"path": path})
+    fd, tmp = tempfile.mkstemp(suffix=".onnx", dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        quantize_dynamic(src, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _session(graph: str, intra_op_threads: int) -> ort.InferenceSession:
+    """
+    Open a CPU session for graph, reusing or saving its ORT-optimized form.
+
+    The optimized graph may contain CPU-specific fused kernels, so it is
+    keyed by ORT version and only ever loaded by the CPU provider.
+    """
+    optimized = f"{graph[:-len('.onnx')]}.ort-{ort.__version__}.onnx"
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = intra_op_threads
+    opts.inter_op_num_threads = 1
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    providers = ["CPUExecutionProvider"]
+    if os.path.exists(optimized):
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return ort.InferenceSession(optimized, sess_options=opts, providers=providers)
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    fd, tmp = tempfile.mkstemp(suffix=".onnx", dir=os.path.dirname(graph))
+    os.close(fd)
+    opts.optimized_model_filepath = tmp
+    try:
+        session = ort.InferenceSession(graph, sess_options=opts, providers=providers)
+        os.replace(tmp, optimized)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return session
+
+
+class _OnnxClassifier:  # pylint: disable=too-few-public-methods
+    """Sequence classifier run through ONNX Runtime, called like an HF pipeline."""
+
+    def __init__(self, model: str, quantize: bool, max_length: int, intra_op_threads: int):
+        """
+        Export (or reuse) the ONNX graph for model and open an inference session.
+
+        Args:
+            model: HuggingFace model ID or local path.
+            quantize: Apply dynamic int8 quantization to the exported graph.
+            max_length: Truncate inputs to this many tokens.
+            intra_op_threads: ONNX Runtime intra-op threads; ``0`` lets ORT decide.
+        """
+        self.config = AutoConfig.from_pretrained(model)
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self._max_length = max_length
+        cache = _cache_dir(model, _revision(model, self.config))
+        os.makedirs(cache, exist_ok=True)
+        graph = os.path.join(cache, "model.onnx")
+        if not os.path.exists(graph):
+            _export(model, self.tokenizer, graph)
+        if quantize:
+            quantized = os.path.join(cache, "model-int8.onnx")
+            if not os.path.exists(quantized):
+                _quantize(graph, quantized)
+            graph = quantized
+
+        self._session = _session(graph, intra_op_threads)
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._labels = [self.config.id2label[i] for i in range(self.config.num_labels)]
+        # Same rule as the transformers text-classification pipeline: sigmoid
+        # for multi-label or single-logit models, softmax otherwise.
+        self._sigmoid = (
+            getattr(self.config, "problem_type", None) == "multi_label_classification"
+            or self.config.num_labels == 1
+        )
+        logger.info(
+            "onnx session ready", extra={"graph": graph, "intra_op_threads": intra_op_threads}
+        )
+
+    def _probabilities(self, logits: np.ndarray) -> np.ndarray:
+        """Turn logits into per-label scores the way the HF pipeline does."""
+        if self._sigmoid:
+            return 1.0 / (1.0 + np.exp(-logits))
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+
+    def __call__(self, texts: list, batch_size: int = 1) -> list:
+        """Score texts in padded batches; one label/score list per text, best first."""
+        out = []
+        step = max(1, batch_size)
+        for start in range(0, len(texts), step):
+            with tracing.span("tokenize"):
+                enc = self.tokenizer(
+                    texts[start:start + step],
+                    padding=True,
+                    truncation=True,
+                    max_length=self._max_length,
+                    return_tensors="np",
+                )
+            feed = {k: v.astype(np.int64) for k, v in enc.items() if k in self._input_names}
+            with tracing.span("forward"):
+                (logits,) = self._session.run(["logits"], feed)
+            for row in self._probabilities(logits.astype(np.float64)):
+                ranked = sorted(zip(self._labels, row.tolist()), key=lambda p: p[1], reverse=True)
+                out.append([{"label": label, "score": score} for label, score in ranked])
+        return out
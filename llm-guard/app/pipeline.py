@@ -1,11 +1,26 @@
 """Scanner pipeline — loads from the CONFIG_FILE YAML (required)."""
+import hashlib
 import logging
+import threading
+import time
 from typing import Optional
 
 import yaml
 
 import config
-from scanner_types import InvisibleTextScanner, PromptInjectionScanner, RegexScanner, ScanResult
+import inference
+import metrics
+import tracing
+from cache import _VerdictCache
+from normalization import VIEWS, TextViews
+from results import ScanResult
+from scanner_types import (
+    InvisibleTextScanner,
+    PromptInjectionScanner,
+    RegexScanner,
+    invisible_pattern,
+)
+from similarity import EmbeddingSimilarityScanner
 
 logger = logging.getLogger(__name__)
 
@@ -13,19 +28,90 @@ _SCANNER_TYPES = {
     "PromptInjection": PromptInjectionScanner,
     "Regex": RegexScanner,
     "InvisibleText": InvisibleTextScanner,
+    "EmbeddingSimilarity": EmbeddingSimilarityScanner,
 }
 
 
-def _build_from_config(path: str) -> list:
-    """Build scanner list from a YAML config file."""
-    with open(path, encoding="utf-8") as fh:
-        cfg = yaml.safe_load(fh) or {}
+_MODES = frozenset({"sequential", "fail_fast", "concurrent"})
+_ORDERS = frozenset({"declared", "measured"})
+
+# Weight of the newest sample in each scanner's moving-average latency.
+_LATENCY_EWMA_ALPHA = 0.1
+
+
+class _Stage:
+    """One configured scanner with its declared cost, text view and measured latency."""
+
+    __slots__ = ("name", "scanner", "cost", "view", "latency", "_histogram", "_span")
+
+    def __init__(self, name: str, scanner, cost: float, view: str = "raw"):
+        """Initialise a stage with no latency measured yet."""
+        self.name = name
+        self.scanner = scanner
+        self.cost = cost
+        self.view = view
+        self.latency: Optional[float] = None
+        self._histogram = metrics.SCANNER_LATENCY.labels(name)
+        self._span = f"scanner.{name}"
+
+    def observe(self, seconds: float):
+        """Fold one per-text latency sample into the moving average."""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += _LATENCY_EWMA_ALPHA * (seconds - self.latency)
+
+    def scan(self, text: str) -> ScanResult:
+        """Run the scanner on one text, recording its latency."""
+        start = time.perf_counter()
+        with tracing.span(self._span):
+            result = self.scanner.scan(text)
+        elapsed = time.perf_counter() - start
+        self.observe(elapsed)
+        self._histogram.observe(elapsed)
+        metrics.scanner_result(self.name, result.is_safe)
+        return result
+
+    def scan_batch(self, texts: list) -> list:
+        """Run the scanner on several texts, recording the per-text latency."""
+        start = time.perf_counter()
+        with tracing.span(self._span, {"texts": len(texts)}):
+            results = self.scanner.scan_batch(texts)
+        elapsed = time.perf_counter() - start
+        self.observe(elapsed / len(texts))
+        self._histogram.observe(elapsed)
+        for result in results:
+            metrics.scanner_result(self.name, result.is_safe)
+        return results
+
+    def scan_views(self, views: list) -> list:
+        """Run scan_batch() on this stage's view of each TextViews."""
+        return self.scan_batch([v.get(self.view) for v in views])
+
+
+def _build_from_config(raw: str, path: str) -> tuple:
+    """
+    Build the scanner stages and pipeline options from the YAML text at path.
+
+    Returns:
+        tuple: (stages, options) where options holds the validated ``pipeline``
+        mapping (``mode`` and ``order``).
+    """
+    cfg = yaml.safe_load(raw) or {}
     if not isinstance(cfg, dict):
         raise ValueError(f"Config file must be a YAML mapping, got {type(cfg).__name__}")
     scanners = cfg.get("input_scanners", [])
     if not isinstance(scanners, list):
         raise ValueError(f"input_scanners must be a list, got {type(scanners).__name__}")
-    scanner_list = []
+    options = cfg.get("pipeline") or {}
+    if not isinstance(options, dict):
+        raise ValueError(f"pipeline must be a mapping, got {type(options).__name__}")
+    options = {"mode": options.get("mode", "sequential"), "order": options.get("order", "declared")}
+    if options["mode"] not in _MODES:
+        raise ValueError(f"Unknown pipeline mode: {options['mode']!r}")
+    if options["order"] not in _ORDERS:
+        raise ValueError(f"Unknown pipeline order: {options['order']!r}")
+    stages = []
     seen_names: set = set()
     for i, entry in enumerate(scanners):
         if not isinstance(entry, dict):
@@ -38,59 +124,367 @@ def _build_from_config(path: str) -> list:
         if scanner_type in seen_names:
             raise ValueError(f"Duplicate scanner type: {scanner_type!r}")
         seen_names.add(scanner_type)
-        scanner_list.append(cls(**params))
-    if not scanner_list:
+        cost = entry.get("cost", cls.cost)
+        view = entry.get("view", "raw")
+        if view not in VIEWS:
+            raise ValueError(f"input_scanners[{i}] view must be one of {VIEWS}, got {view!r}")
+        if params.get("redact") and view != "raw":
+            # Redactions would land on the normalised copy, and returning that
+            # as sanitized_prompt would rewrite the rest of the user's text.
+            raise ValueError(f"input_scanners[{i}] redact requires view 'raw', got {view!r}")
+        stages.append(_Stage(scanner_type, cls(**params), float(cost), view))
+    if not stages:
         raise ValueError(f"CONFIG_FILE {path!r} defines no input_scanners")
-    return scanner_list
+    return stages, options
 
 
 class _Pipeline:
-    """Ordered list of scanners run sequentially against each prompt."""
+    """Ordered list of scanners run sequentially against each prompt.
+
+    A conclusive block (e.g. a near-copy of a known attack) ends the scan in
+    every mode. A conclusive allow (a near-copy of a known-good prompt) skips
+    only the model-backed scanners after it: cheap ones such as Regex and
+    InvisibleText still run, as a prompt can match a known-good one and
+    still carry a credential or hidden characters. In ``fail_fast`` mode
+    scanners run cheapest first, by declared ``cost`` or by measured latency
+    (``order: measured``), and the scan stops at the first unsafe result;
+    scanners that never ran score ``None``. In
+    ``concurrent`` mode each model-backed scanner runs as its own task on the
+    inference executor while the cheap scanners run together in another, so
+    latency tracks the slowest scanner; results are still folded in config
+    order, so blocked_reason precedence matches ``sequential``.
+
+    A pipeline is immutable once loaded: reload() builds a new one (reusing
+    the old one's models where possible) and swaps the module-level
+    reference, so requests already running finish on the pipeline they
+    started with.
+
+    Each scanner reads the text view its entry names (``view``, default
+    ``raw``; see normalization.py). Views are built once per prompt and
+    shared, so scanners asking for the same view do not each normalise it.
+
+    Verdicts are cached by a hash of the loaded config plus the exact prompt
+    text, and the cache is cleared when reload() swaps in a new pipeline.
+    The text is deliberately not normalised for the key: scanners such as
+    InvisibleText and Regex give different verdicts for texts that only
+    differ in whitespace, case or Unicode form.
+    """
 
-    def __init__(self):
-        """Initialise with empty scanner list."""
-        self._scanners: list = []
+    def __init__(self, cache: Optional[_VerdictCache] = None):
+        """Initialise with empty scanner list, sharing cache if given."""
+        self._stages: list = []
+        self._fail_fast = False
+        self._concurrent = False
+        self._measured = False
+        self._config_digest = b""
+        self.cache = cache or _VerdictCache(
+            max_entries=config.VERDICT_CACHE_MAX_ENTRIES,
+            max_bytes=config.VERDICT_CACHE_MAX_BYTES,
+            ttl_seconds=config.VERDICT_CACHE_TTL_SECONDS,
+            eviction=config.VERDICT_CACHE_EVICTION,
+        )
 
-    def load(self):
+    def load(self, previous: Optional["_Pipeline"] = None):
         """Load all configured scanners from the CONFIG_FILE YAML.
 
         CONFIG_FILE is required: there is no ENV fallback. A missing or empty
         value fails closed (RuntimeError) rather than silently serving an
         unconfigured pipeline.
+
+        Args:
+            previous: The pipeline being replaced. Its model-backed scanners
+                lend their loaded models to new scanners with the same
+                model_key instead of loading them again.
         """
         if not config.CONFIG_FILE:
             raise RuntimeError("CONFIG_FILE is required but not set")
         logger.info("loading scanner config", extra={"path": config.CONFIG_FILE})
-        self._scanners = _build_from_config(config.CONFIG_FILE)
+        with open(config.CONFIG_FILE, encoding="utf-8") as fh:
+            raw = fh.read()
+        self._stages, options = _build_from_config(raw, config.CONFIG_FILE)
+        self._fail_fast = options["mode"] == "fail_fast"
+        self._concurrent = options["mode"] == "concurrent"
+        self._measured = options["order"] == "measured"
+        self._config_digest = hashlib.sha256(raw.encode("utf-8")).digest()
+        inference.set_batchers(sum(stage.scanner.batchers for stage in self._stages))
+
+        previous_stages = previous._stages if previous is not None else []  # pylint: disable=protected-access
+        donors = {
+            stage.scanner.model_key: stage.scanner
+            for stage in previous_stages
+            if stage.scanner.model_backed
+        }
+        try:
+            for stage in self._stages:
+                if stage.scanner.model_backed:
+                    stage.scanner.load(reuse=donors.get(stage.scanner.model_key))
+                else:
+                    stage.scanner.load()
+        except Exception:
+            self.close()
+            raise
+        if any(stage.view in ("stripped", "casefold") for stage in self._stages):
+            # Built now rather than by the first request that needs the view.
+            invisible_pattern()
+        logger.info("pipeline ready", extra={"scanners": len(self._stages), **options})
+
+    def warmup(self):
+        """Run each model-backed scanner's warmup shapes; call before serving traffic."""
+        for stage in self._stages:
+            if stage.scanner.model_backed:
+                start = time.perf_counter()
+                stage.scanner.warmup()
+                logger.info(
+                    "scanner warmed up",
+                    extra={"scanner": stage.name, "seconds": round(time.perf_counter() - start, 3)},
+                )
+
+    def close(self):
+        """Stop the scanners' background threads; shared models stay loaded."""
+        for stage in self._stages:
+            if stage.scanner.model_backed:
+                stage.scanner.close()
 
-        for scanner in self._scanners:
-            scanner.load()
-        logger.info("pipeline ready", extra={"scanners": len(self._scanners)})
+    def stale(self) -> bool:
+        """True if CONFIG_FILE's content differs from what this pipeline loaded."""
+        try:
+            with open(config.CONFIG_FILE, encoding="utf-8") as fh:
+                raw = fh.read()
+        except OSError:
+            return False
+        return hashlib.sha256(raw.encode("utf-8")).digest() != self._config_digest
+
+    def _cache_key(self, text: str) -> bytes:
+        """Hash the loaded config digest together with the prompt text."""
+        h = hashlib.sha256(self._config_digest)
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.digest()
 
     def scan(self, text: str) -> tuple:
         """
-        Run all scanners against text.
+        Run all scanners against text, serving repeats from the verdict cache.
+
+        Returns:
+            tuple: (is_safe, scores_dict, blocked_reason, sanitized) where
+            scores_dict maps scanner name to float score, blocked_reason is None
+            if safe and sanitized is the redacted text, or None if no scanner
+            rewrote it.
+        """
+        if not self.cache.enabled:
+            return self._scan(text)
+        with tracing.span("cache"):
+            key = self._cache_key(text)
+            cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self._scan(text)
+        self.cache.put(key, result)
+        return result
+
+    def scan_many(self, texts: list) -> list:
+        """
+        Scan each text as its own unit, batching model inference across them.
+
+        Texts already in the verdict cache cost nothing; only the misses are
+        run through the scanners, each scanner seeing all misses at once.
 
         Returns:
-            tuple: (is_safe, scores_dict, blocked_reason) where scores_dict maps
-            scanner name to float score and blocked_reason is None if safe.
+            list: One (is_safe, scores_dict, blocked_reason, sanitized) tuple per text.
         """
-        scores: dict = {}
-        blocked_reason: Optional[str] = None
-        all_safe = True
+        verdicts, keys = self._lookup(texts)
+        misses = [i for i, v in enumerate(verdicts) if v is None]
+        if not misses:
+            return verdicts
+        stages = self._ordered()
+        views = {i: TextViews(texts[i]) for i in misses}
+        results: dict = {i: [] for i in misses}
+        skipped: dict = {i: [] for i in misses}
+        allowed: set = set()
+        pending = misses
+        for n, stage in enumerate(stages):
+            if not pending:
+                break
+            run = pending
+            if stage.scanner.model_backed and allowed:
+                run = [i for i in pending if i not in allowed]
+                for i in allowed.intersection(pending):
+                    skipped[i].append(stage.name)
+            if not run:
+                continue
+            batch = stage.scan_views([views[i] for i in run])
+            stopped = set()
+            for i, result in zip(run, batch):
+                results[i].append(result)
+                if _allows(result):
+                    allowed.add(i)
+                elif result.conclusive or (self._fail_fast and not result.is_safe):
+                    stopped.add(i)
+                    skipped[i].extend(s.name for s in stages[n + 1:])
+            if stopped:
+                pending = [i for i in pending if i not in stopped]
+        for i in misses:
+            verdicts[i] = _verdict(results[i], skipped[i])
+            if keys[i] is not None:
+                self.cache.put(keys[i], verdicts[i])
+        return verdicts
+
+    def _lookup(self, texts: list) -> tuple:
+        """Return (cached verdicts or None, cache keys or None) for each text."""
+        verdicts: list = [None] * len(texts)
+        keys: list = [None] * len(texts)
+        if self.cache.enabled:
+            with tracing.span("cache"):
+                for i, text in enumerate(texts):
+                    keys[i] = self._cache_key(text)
+                    verdicts[i] = self.cache.get(keys[i])
+        return verdicts, keys
+
+    async def scan_async(self, text: str) -> tuple:
+        """Scan text on the inference executor; same return shape as scan()."""
+        if not self._concurrent:
+            return await inference.run(self.scan, text)
+        return (await self.scan_many_async([text]))[0]
+
+    async def scan_many_async(self, texts: list) -> list:
+        """Scan texts on the inference executor; same return shape as scan_many()."""
+        if not self._concurrent:
+            return await inference.run(self.scan_many, texts)
+        # Hashing and a dict lookup: cheaper inline than a hop to the executor.
+        verdicts, keys = self._lookup(texts)
+        misses = [i for i, v in enumerate(verdicts) if v is None]
+        if not misses:
+            return verdicts
+        # Shared by the tasks below; each view is computed by whichever task
+        # needs it first (at worst twice, if two ask at the same moment).
+        miss_views = [TextViews(texts[i]) for i in misses]
+        model = [s for s in self._stages if s.scanner.model_backed]
+        cheap = [s for s in self._stages if not s.scanner.model_backed]
+
+        def run_cheap() -> list:
+            return [s.scan_views(miss_views) for s in cheap]
+
+        cheap_out, *model_out = await inference.gather(
+            inference.run(run_cheap),
+            *(inference.run(s.scan_views, miss_views) for s in model),
+        )
+        by_stage = dict(zip(map(id, cheap), cheap_out))
+        by_stage.update(zip(map(id, model), model_out))
+        per_stage = [by_stage[id(s)] for s in self._stages]
+        for j, i in enumerate(misses):
+            # Conclusive results are folded as a sequential scan would have
+            # stopped on them; the skipped scanners' work is discarded.
+            results: list = []
+            skipped: list = []
+            allowed = False
+            for n, (stage, stage_results) in enumerate(zip(self._stages, per_stage)):
+                if allowed and stage.scanner.model_backed:
+                    skipped.append(stage.name)
+                    continue
+                result = stage_results[j]
+                results.append(result)
+                if _allows(result):
+                    allowed = True
+                elif result.conclusive:
+                    skipped.extend(s.name for s in self._stages[n + 1:])
+                    break
+            verdicts[i] = _verdict(results, skipped)
+            if keys[i] is not None:
+                self.cache.put(keys[i], verdicts[i])
+        return verdicts
 
-        for scanner in self._scanners:
-            result: ScanResult = scanner.scan(text)
-            scores[result.scanner] = result.score
-            if not result.is_safe:
-                all_safe = False
-                if blocked_reason is None:
-                    blocked_reason = result.reason
+    def open_stream(self) -> list:
+        """Return ``(name, stream, view)`` for each scanner, in config order, for a new stream."""
+        return [(stage.name, stage.scanner.open_stream(), stage.view) for stage in self._stages]
 
-        return all_safe, scores, blocked_reason
+    def _ordered(self) -> list:
+        """Return stages in run order: config order, or cheapest first for fail_fast."""
+        if not self._fail_fast:
+            return self._stages
+        if self._measured and all(s.latency is not None for s in self._stages):
+            return sorted(self._stages, key=lambda s: s.latency)
+        return sorted(self._stages, key=lambda s: s.cost)
+
+    def _scan(self, text: str) -> tuple:
+        """Run all scanners against text; same return shape as scan()."""
+        stages = self._ordered()
+        views = TextViews(text)
+        results = []
+        skipped = []
+        allowed = False
+        for n, stage in enumerate(stages):
+            if allowed and stage.scanner.model_backed:
+                skipped.append(stage.name)
+                continue
+            result = stage.scan(views.get(stage.view))
+            results.append(result)
+            if _allows(result):
+                allowed = True
+            elif result.conclusive or (self._fail_fast and not result.is_safe):
+                skipped.extend(s.name for s in stages[n + 1:])
+                break
+        return _verdict(results, skipped)
+
+
+def _allows(result: ScanResult) -> bool:
+    """True for a conclusive allow, which skips only the model-backed scanners after it."""
+    return result.conclusive and result.is_safe
+
+
+def _verdict(results: "list[ScanResult]", skipped: list) -> tuple:
+    """Fold one text's ScanResults, in run order, into a verdict tuple.
+
+    Scanners named in skipped did not run and are reported with score None.
+    """
+    scores: dict = {}
+    blocked_reason: Optional[str] = None
+    sanitized: Optional[str] = None
+    all_safe = True
+
+    for result in results:
+        scores[result.scanner] = result.score
+        if result.stage_scores:
+            scores.update(result.stage_scores)
+        if not result.is_safe:
+            all_safe = False
+            if blocked_reason is None:
+                blocked_reason = result.reason
+        if sanitized is None:
+            sanitized = result.sanitized
+    for name in skipped:
+        scores[name] = None
+
+    return all_safe, scores, blocked_reason, sanitized
+
+
+def merge_verdicts(verdicts: list) -> tuple:
+    """
+    Aggregate per-message verdicts into one verdict for the whole request.
+
+    The request is unsafe if any message is; scores are the per-scanner max
+    across messages (None only if no message ran that scanner) and
+    blocked_reason is the first blocked message's reason.
+
+    Returns:
+        tuple: (is_safe, scores_dict, blocked_reason, blocked_index) where
+        blocked_index is the first unsafe message's index, or None if safe.
+    """
+    scores: dict = {}
+    for _, msg_scores, _, _ in verdicts:
+        for name, score in msg_scores.items():
+            # None means "not run" for that message; any real score wins.
+            prev = scores.get(name)
+            if prev is None:
+                scores[name] = score
+            elif score is not None:
+                scores[name] = max(prev, score)
+    for i, (is_safe, _, reason, _) in enumerate(verdicts):
+        if not is_safe:
+            return False, scores, reason, i
+    return True, scores, None, None
 
 
 _PIPELINE = _Pipeline()
+_RELOAD_LOCK = threading.Lock()
 
 
 def load():
@@ -98,6 +492,72 @@ def load():
     _PIPELINE.load()
 
 
+def reload():
+    """
+    Rebuild the pipeline from CONFIG_FILE and swap it in atomically.
+
+    Models whose model/backend params are unchanged are reused rather than
+    reloaded, and the new pipeline is warmed up before it takes traffic.
+    Requests already holding the old pipeline finish on it; its batcher
+    threads drain and exit. If the new config fails to load the old
+    pipeline stays in service and the error is raised.
+    """
+    global _PIPELINE  # pylint: disable=global-statement
+    with _RELOAD_LOCK:
+        old = _PIPELINE
+        new = _Pipeline(cache=old.cache)
+        new.load(previous=old)
+        new.warmup()
+        _PIPELINE = new
+        # Keys carry the config digest, so the old pipeline's verdicts could
+        # never be served by the new one; they only held memory. Cleared at
+        # the swap, not during load, so the old pipeline keeps its hits until
+        # it is replaced.
+        new.cache.clear()
+        old.close()
+    logger.info("pipeline reloaded")
+
+
+def warmup():
+    """Warm up the module-level pipeline's model-backed scanners."""
+    _PIPELINE.warmup()
+
+
+def stale() -> bool:
+    """True if CONFIG_FILE changed since the module-level pipeline was loaded."""
+    return _PIPELINE.stale()
+
+
+def loaded() -> bool:
+    """True once the module-level pipeline has loaded its scanners."""
+    return bool(_PIPELINE._stages)  # pylint: disable=protected-access
+
+
 def scan(text: str) -> tuple:
-    """Run all scanners; return (is_safe, scores_dict, blocked_reason)."""
+    """Run all scanners; return (is_safe, scores_dict, blocked_reason, sanitized)."""
     return _PIPELINE.scan(text)
+
+
+def scan_many(texts: list) -> list:
+    """Scan each text as its own unit; return one verdict tuple per text."""
+    return _PIPELINE.scan_many(texts)
+
+
+async def scan_async(text: str) -> tuple:
+    """Await a scan run on the inference executor; same result as scan()."""
+    return await _PIPELINE.scan_async(text)
+
+
+async def scan_many_async(texts: list) -> list:
+    """Await scan_many() run on the inference executor."""
+    return await _PIPELINE.scan_many_async(texts)
+
+
+def open_stream() -> list:
+    """Open per-scanner stream state on the module-level pipeline."""
+    return _PIPELINE.open_stream()
+
+
+def cache_stats() -> dict:
+    """Return verdict cache counters for the module-level pipeline."""
+    return _PIPELINE.cache.stats()
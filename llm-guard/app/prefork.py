@@ -0,0 +1,154 @@
+"""Pre-fork multi-process serving.
+
+The master process loads the scanner pipeline once, binds the listening
+socket and forks WORKERS children, each running its own uvicorn server on
+the shared socket. Children inherit the loaded model weights copy-on-write:
+weight tensors are never written after load, so their pages stay shared and
+total RSS grows far slower than WORKERS x model size. ``gc.freeze()`` before
+forking keeps the collector from touching (and so copying) the pages of
+objects created during load.
+
+The master runs no inference itself; torch/OpenMP thread pools are not
+fork-safe once they have started work, so all scanning happens in children.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+import logs
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-worker readiness flags in anonymous shared memory, sized by the
+# master before forking so every child sees every other child's flag.
+# Empty until serve() runs, so readiness() reports no workers.
+_STATE: dict = {"ready": multiprocessing.RawArray("b", 0), "index": None}
+
+
+def active() -> bool:
+    """True in a worker forked by serve()."""
+    return _STATE["index"] is not None
+
+
+def mark_ready(ready: bool = True):
+    """Set this worker's readiness flag."""
+    if active():
+        _STATE["ready"][_STATE["index"]] = 1 if ready else 0
+
+
+def readiness() -> tuple:
+    """Return (ready_workers, total_workers) across all forked workers; (0, 0) before serve()."""
+    flags = _STATE["ready"]
+    return sum(flags), len(flags)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    """Create the listening socket shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(app, sock: socket.socket, index: int) -> int:
+    """Fork one worker serving app on sock; return its pid in the parent."""
+    pid = os.fork()
+    if pid:
+        return pid
+    # --- child ---
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Ignored until the worker's lifespan installs its reload handler.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    _STATE["index"] = index
+    _STATE["ready"][index] = 0
+    try:
+        server = uvicorn.Server(uvicorn.Config(app, log_config=None))
+        server.run(sockets=[sock])
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("worker crashed", extra={"worker": index})
+        logs.stop()
+        os._exit(1)
+    # os._exit skips atexit, so write out queued log records first.
+    logs.stop()
+    os._exit(0)
+
+
+def serve(app, host: str, port: int, workers: int, preload):
+    """
+    Preload, fork ``workers`` uvicorn workers and supervise them until signalled.
+
+    Args:
+        app: ASGI application each worker serves.
+        host: Bind address.
+        port: Bind port.
+        workers: Number of worker processes.
+        preload: Called once in the master before forking to load shared resources.
+    """
+    preload()
+    _STATE["ready"] = multiprocessing.RawArray("b", workers)
+    sock = _bind(host, port)
+    gc.collect()
+    gc.freeze()
+
+    children: dict = {}
+    stopping = {"flag": False}
+
+    def _stop(signum, _frame):
+        stopping["flag"] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reload(signum, _frame):
+        # Each worker reloads CONFIG_FILE itself; workers restarted later
+        # notice the master's pipeline is stale and reload on startup.
+        logger.info("forwarding reload to workers", extra={"workers": len(children)})
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGHUP, _reload)
+
+    for index in range(workers):
+        children[_spawn(app, sock, index)] = index
+    logger.info("workers started", extra={"workers": workers, "pids": sorted(children)})
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        _STATE["ready"][index] = 0
+        metrics.mark_process_dead(pid)
+        if stopping["flag"]:
+            continue
+        logger.warning(
+            "worker exited; restarting",
+            extra={"worker": index, "pid": pid, "status": os.waitstatus_to_exitcode(status)},
+        )
+        # Brief pause so a worker that dies on startup doesn't spin the master.
+        time.sleep(1)
+        children[_spawn(app, sock, index)] = index
+    sock.close()
+    sys.exit(0)
@@ -0,0 +1,205 @@
+"""On-demand profiling of a live worker, served by POST /admin/profile.
+
+A capture runs for a fixed number of seconds and produces two artifacts:
+
+* ``cpu.collapsed``: a wall-clock sampling profile of every Python thread
+  (event loop, inference executor, micro-batchers), one
+  ``thread;outer frame;...;inner frame count`` line per distinct stack. Open
+  it with speedscope or flamegraph.pl.
+* ``forward-NNN.json``: a torch profiler trace of each of the next N model
+  forward passes of torch-backed scanners, in Chrome trace format (open in
+  Perfetto or chrome://tracing). ONNX-backed scanners appear in the CPU
+  profile only.
+
+Nothing is recorded between captures: forward() costs one dict lookup, and
+the sampler thread exists only while a capture runs. With WORKERS>1 a
+capture covers the worker process that served the request.
+"""
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_STATE: dict = {"forward": None}
+_CAPTURE_LOCK = threading.Lock()
+_PROFILER_LOCK = threading.Lock()
+
+
+class _ForwardCapture:
+    """Collects torch profiler traces for up to ``limit`` forward passes."""
+
+    def __init__(self, limit: int):
+        """Initialise an empty capture."""
+        self.limit = limit
+        self.claimed = 0
+        self.running = 0
+        self.traces: list = []
+        self.lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """Reserve one forward pass for profiling; False once limit are reserved."""
+        with self.lock:
+            if self.claimed >= self.limit:
+                return False
+            self.claimed += 1
+            self.running += 1
+            return True
+
+    def finish(self, label: str, trace: Optional[str]):
+        """Release a claimed pass, storing its Chrome trace if one was exported."""
+        with self.lock:
+            self.running -= 1
+            if trace is not None:
+                self.traces.append((label, trace))
+
+
+def _start_torch_profiler():
+    """Start a CPU torch profiler; None if it cannot start, so the pass runs unprofiled."""
+    try:
+        import torch  # pylint: disable=import-outside-toplevel
+
+        prof = torch.profiler.profile(
+            activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+        )
+        prof.start()
+        return prof
+    except (ImportError, RuntimeError):
+        logger.warning("torch profiler unavailable; forward pass not profiled", exc_info=True)
+        return None
+
+
+@contextmanager
+def forward(label: str):
+    """Profile the enclosed forward pass with torch's profiler while a capture wants it.
+
+    Only one torch profiler can run per process, so a pass that starts while
+    another scanner's pass is being profiled runs unprofiled.
+    """
+    active = _STATE["forward"]
+    if active is None or not _PROFILER_LOCK.acquire(blocking=False):
+        yield
+        return
+    try:
+        if not active.claim():
+            yield
+            return
+        trace = None
+        try:
+            prof = _start_torch_profiler()
+            try:
+                yield
+            finally:
+                if prof is not None:
+                    prof.stop()
+            if prof is not None:
+                # export_chrome_trace only writes to a path (replacing any file there).
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "trace.json")
+                    prof.export_chrome_trace(path)
+                    with open(path, encoding="utf-8") as fh:
+                        trace = fh.read()
+        finally:
+            active.finish(label, trace)
+    finally:
+        _PROFILER_LOCK.release()
+
+
+def _frame_label(frame) -> str:
+    """Name a frame by function and defining file, so samples aggregate per function."""
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample(seconds: float, hz: float) -> tuple:
+    """
+    Sample every other thread's Python stack hz times a second for seconds.
+
+    Returns:
+        tuple: (Counter of collapsed stack -> samples, sampling rounds taken).
+    """
+    stacks: Counter = Counter()
+    me = threading.get_ident()
+    interval = 1.0 / hz
+    rounds = 0
+    deadline = time.monotonic() + seconds
+    next_tick = time.monotonic()
+    while next_tick < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+        rounds += 1
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    return stacks, rounds
+
+
+def capture(seconds: float, forward_passes: int) -> bytes:
+    """
+    Profile this process for seconds and return the artifacts as a zip archive.
+
+    Args:
+        seconds: Capture length, capped at PROFILE_MAX_SECONDS.
+        forward_passes: Torch-backed forward passes to trace within that time (0 = none).
+
+    Raises:
+        RuntimeError: Another capture is already running.
+    """
+    # Non-blocking, so a second capture fails at once rather than queueing.
+    if not _CAPTURE_LOCK.acquire(blocking=False):  # pylint: disable=consider-using-with
+        raise RuntimeError("a profile capture is already running")
+    try:
+        seconds = min(max(seconds, 0.1), config.PROFILE_MAX_SECONDS)
+        forwards = _ForwardCapture(forward_passes) if forward_passes > 0 else None
+        _STATE["forward"] = forwards
+        started = time.time()
+        try:
+            stacks, rounds = _sample(seconds, config.PROFILE_SAMPLE_HZ)
+        finally:
+            _STATE["forward"] = None
+        # Passes claimed before the capture ended may still be running.
+        traces = []
+        if forwards is not None:
+            wait_until = time.monotonic() + config.PROFILE_MAX_SECONDS
+            while forwards.running and time.monotonic() < wait_until:
+                time.sleep(0.01)
+            with forwards.lock:
+                traces = list(forwards.traces)
+        summary = {
+            "pid": os.getpid(),
+            "started": started,
+            "seconds": seconds,
+            "sample_hz": config.PROFILE_SAMPLE_HZ,
+            "sampling_rounds": rounds,
+            "forward_passes_requested": forward_passes,
+            "forward_passes": [label for label, _ in traces],
+        }
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("profile.json", json.dumps(summary, indent=2))
+            zf.writestr(
+                "cpu.collapsed", "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+            )
+            for i, (label, trace) in enumerate(traces):
+                zf.writestr(f"forward-{i:03d}-{label.strip('/').replace('/', '--')}.json", trace)
+        return out.getvalue()
+    finally:
+        _CAPTURE_LOCK.release()
@@ -0,0 +1,20 @@
+"""The verdict type every scanner returns."""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ScanResult:
+    """Result from a single scanner."""
+
+    scanner: str
+    is_safe: bool
+    score: float
+    reason: Optional[str] = None
+    # Text with offending content redacted, if the scanner rewrote it.
+    sanitized: Optional[str] = None
+    # The verdict is certain. A conclusive block skips the remaining scanners;
+    # a conclusive allow skips only the remaining model-backed ones.
+    conclusive: bool = False
+    # Extra per-stage scores reported next to ``score`` (e.g. cascade stages).
+    stage_scores: Optional[dict] = None
@@ -1,12 +1,24 @@
 """Individual scanner implementations."""
+import importlib.util
 import logging
+import os
 import re
+import shutil
+import sys
+import threading
 import unicodedata
-from dataclasses import dataclass
 from typing import Optional
-from transformers import Pipeline, pipeline
+
+from transformers import Pipeline, TextClassificationPipeline, pipeline
 
 import config
+import inference
+import metrics
+import profiler
+import tracing
+from batching import _MicroBatcher
+from results import ScanResult
+from streams import _ChunkStream, _InjectionStream, _RegexStream
 
 logger = logging.getLogger(__name__)
 
@@ -23,19 +35,139 @@ _INVISIBLE_CODEPOINTS = frozenset({
 })
 
 
-@dataclass
-class ScanResult:
-    """Result from a single scanner."""
+def _invisible_class() -> tuple:
+    """
+    Build one regex character class covering every invisible codepoint.
+
+    Walks the whole codepoint range once so scanning a text is a single
+    C-level regex search instead of a per-character category lookup.
+
+    Returns:
+        tuple: (compiled pattern, number of codepoints in the class)
+    """
+    ranges: list = []
+    count = 0
+    for cp in range(sys.maxunicode + 1):
+        if cp in _INVISIBLE_CODEPOINTS or unicodedata.category(chr(cp)) in _INVISIBLE_CATEGORIES:
+            count += 1
+            if ranges and ranges[-1][1] == cp - 1:
+                ranges[-1][1] = cp
+            else:
+                ranges.append([cp, cp])
+    body = "".join(
+        f"\\U{lo:08x}" if lo == hi else f"\\U{lo:08x}-\\U{hi:08x}" for lo, hi in ranges
+    )
+    return re.compile(f"[{body}]"), count
+
+
+# Built on first use: the codepoint walk takes ~0.2 s, which importers that
+# never scan for invisible text should not pay.
+_INVISIBLE: dict = {"pattern": None, "count": 0}
+
+
+def invisible_pattern() -> re.Pattern:
+    """Return the compiled character class of invisible codepoints, building it once."""
+    if _INVISIBLE["pattern"] is None:
+        _INVISIBLE["pattern"], _INVISIBLE["count"] = _invisible_class()
+    return _INVISIBLE["pattern"]
+
 
-    scanner: str
-    is_safe: bool
-    score: float
-    reason: Optional[str] = None
+_BACKENDS = frozenset({"torch", "onnx", "onnx-int8"})
+_REGEX_ENGINES = frozenset({"re", "combined", "hyperscan"})
+_REDACTED = "[REDACTED]"
+
+# Leading global inline flags, e.g. "(?i)" -- only legal at the very start of a
+# pattern, so they are rewritten as a scoped group before combining.
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+# Numbered backreferences and conditionals refer to group numbers, which
+# shift once patterns are wrapped in an alternation.
+_GROUP_NUMBER_REFS = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d")
+
+
+def _combine_patterns(patterns: list) -> Optional[re.Pattern]:
+    """
+    Compile patterns into one alternation of named groups ``_p0|_p1|...``.
+
+    ``match.lastgroup`` then names the pattern that matched. Returns None if
+    the patterns cannot be combined without changing their meaning.
+    """
+    parts = []
+    for i, p in enumerate(patterns):
+        if _GROUP_NUMBER_REFS.search(p):
+            return None
+        flags = _GLOBAL_FLAGS.match(p)
+        if flags:
+            p = f"(?{flags.group(1)}:{p[flags.end():]})"
+        parts.append(f"(?P<_p{i}>{p})")
+    try:
+        return re.compile("|".join(parts))
+    except re.error:
+        return None
+
+
+def _merge_per_pattern(spans: list) -> list:
+    """
+    Merge overlapping ``(start, end, pattern_id)`` spans of the same pattern.
+
+    Hyperscan reports every end offset at which a pattern matches (``sk-a``,
+    ``sk-ab``, ... for ``sk-[a-z0-9]+``) rather than one greedy match, so
+    each pattern's overlapping spans are joined into one before redacting.
+    """
+    merged: list = []
+    for start, end, pattern_id in sorted(spans, key=lambda s: (s[2], s[0])):
+        if merged and merged[-1][2] == pattern_id and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end, pattern_id])
+    return merged
+
+
+def _redact_spans(text, spans: list, marker):
+    """
+    Replace each ``(start, end, ...)`` span of text with marker in one pass.
+
+    Works on str or bytes alike. Spans are merged where they overlap, so a
+    character covered by several patterns' matches is redacted once.
+    """
+    out = []
+    pos = 0
+    for span in sorted(spans):
+        start, end = span[0], span[1]
+        if end <= pos:
+            continue
+        out.append(text[pos:max(pos, start)])
+        out.append(marker)
+        pos = end
+    out.append(text[pos:])
+    return text[:0].join(out)
+
+
+class _TracedTextClassificationPipeline(TextClassificationPipeline):
+    """Text-classification pipeline that instruments tokenization and forward passes.
+
+    Both are recorded as trace spans (tracing.py); forward passes are also
+    profiled while an admin profile capture asks for them (profiler.py).
+    """
+
+    def preprocess(self, inputs, **tokenizer_kwargs):
+        """Tokenize one input within a ``tokenize`` span."""
+        with tracing.span("tokenize"):
+            return super().preprocess(inputs, **tokenizer_kwargs)
+
+    def _forward(self, model_inputs):
+        """Run one model batch within a ``forward`` span, profiled during a capture."""
+        with tracing.span("forward"), profiler.forward(self.model.config.name_or_path):
+            return super()._forward(model_inputs)
 
 
 class PromptInjectionScanner:
     """Detects prompt injection using a HuggingFace text-classification model."""
 
+    # Relative cost used to order scanners in fail_fast pipelines.
+    cost = 100.0
+    # Runs a model: gets its own inference task in concurrent pipelines.
+    model_backed = True
+
     def __init__(self, **kwargs):
         """
         Initialise the scanner from keyword arguments.
@@ -44,8 +176,43 @@ class PromptInjectionScanner:
             model (str): HuggingFace model ID. Defaults to config.DEFAULT_MODEL.
             injection_label (str): Positive-class label. Defaults to config.DEFAULT_INJECTION_LABEL.
             threshold (float): Block threshold [0,1]. Defaults to config.DEFAULT_THRESHOLD.
-            match_type (str): ``"full"`` or ``"sentence"``. Defaults to ``"full"``.
+            match_type (str): ``"full"``, ``"sentence"`` or ``"window"``. Defaults to
+                ``"full"``. ``"window"`` scores overlapping token windows covering the
+                whole text instead of truncating it at model_max_length.
             model_max_length (int): Max token length. Defaults to 512.
+            batch_max_size (int): Max texts per batched forward pass; ``1`` disables
+                micro-batching. Defaults to config.DEFAULT_BATCH_MAX_SIZE.
+            batch_max_wait_ms (float): Max time a text waits for concurrent texts to
+                join its batch. Defaults to config.DEFAULT_BATCH_MAX_WAIT_MS.
+            early_exit (bool): With ``match_type: sentence``, stop scoring further
+                batches once one reaches ``threshold``. Also applies to
+                ``match_type: window``. Defaults to False.
+            window_overlap (int): Tokens shared by consecutive windows with
+                ``match_type: window`` and in streams; must be below
+                model_max_length less the model's special tokens. Defaults to
+                config.DEFAULT_WINDOW_OVERLAP.
+            backend (str): ``"torch"``, ``"onnx"`` or ``"onnx-int8"`` (ONNX Runtime with
+                dynamic int8 quantization). Defaults to ``"torch"``.
+            intra_op_threads (int): ONNX Runtime intra-op threads. Ignored by the
+                torch backend. Defaults to inference.intra_op_threads(), sized
+                for whether this scanner micro-batches.
+            compile (bool): Wrap the torch model in ``torch.compile``; compiled
+                kernels are cached under HF_HOME so later starts reuse them.
+                Needs a C++ compiler on PATH (or CXX), which the slim service
+                image does not ship. Ignored by the ONNX backends, which always
+                cache their optimized graph. Defaults to False.
+            warmup_lengths (list[int]): Approximate token lengths run through the
+                model at batch sizes 1 and batch_max_size before the service
+                reports ready. ``[]`` disables warmup. Defaults to
+                config.DEFAULT_WARMUP_LENGTHS, capped at model_max_length.
+            cascade (dict): Params of a smaller PromptInjection model that scores
+                every text first, plus ``band: [low, high]``. Only texts it scores
+                in ``[low, high)`` are escalated to this scanner's model; below
+                ``low`` they pass and at or above ``high`` they are blocked on the
+                small model's score. ``low <= threshold <= high`` is required.
+                match_type, model_max_length, window_overlap, early_exit and the
+                batch params are inherited unless set. Streams use only this
+                scanner's model. Defaults to None (no cascade).
         """
         self._model = kwargs.get("model", "") or config.DEFAULT_MODEL
         self._injection_label = kwargs.get("injection_label", "") or config.DEFAULT_INJECTION_LABEL
@@ -53,20 +220,170 @@ class PromptInjectionScanner:
         self._threshold = config.DEFAULT_THRESHOLD if threshold is None else threshold
         self._match_type = kwargs.get("match_type", "full")
         self._model_max_length = kwargs.get("model_max_length", 512)
-        self._pipe: Optional[Pipeline] = None
+        self._batcher = _MicroBatcher.from_params(self._score_batch, kwargs)
+        self._batch_max_size = self._batcher.max_batch_size
+        self._early_exit = bool(kwargs.get("early_exit", False))
+        window_overlap = kwargs.get("window_overlap", None)
+        self._window_overlap = int(
+            config.DEFAULT_WINDOW_OVERLAP if window_overlap is None else window_overlap
+        )
+        # Checked against the exact window size (less special tokens) in _validate().
+        if not 0 <= self._window_overlap < self._model_max_length:
+            raise ValueError(
+                f"window_overlap must be >= 0 and below model_max_length "
+                f"({self._model_max_length}), got {self._window_overlap}"
+            )
+        self._backend = kwargs.get("backend", "torch")
+        if self._backend not in _BACKENDS:
+            raise ValueError(
+                f"Unknown backend: {self._backend!r}; expected one of {sorted(_BACKENDS)}"
+            )
+        # 0 = resolved at load, once the pipeline has counted its batchers.
+        self._intra_op_threads = int(kwargs.get("intra_op_threads", 0))
+        self._compile = bool(kwargs.get("compile", False))
+        # Inductor builds its kernels with the host C++ compiler, which slim
+        # images lack; fail when the config is parsed rather than on first scan.
+        if self._compile and not any(
+            shutil.which(cxx) for cxx in (os.environ.get("CXX", ""), "c++", "g++", "clang++") if cxx
+        ):
+            raise RuntimeError(
+                "PromptInjection compile: true requires a C++ compiler (set CXX or install g++)"
+            )
+        self._cascade: Optional[PromptInjectionScanner] = None
+        self._cascade_band = (0.0, 1.0)
+        cascade = kwargs.get("cascade", None)
+        if cascade:
+            cascade = dict(cascade)
+            low, high = (float(b) for b in cascade.pop("band", config.DEFAULT_CASCADE_BAND))
+            if not 0.0 <= low <= self._threshold <= high <= 1.0:
+                raise ValueError(
+                    f"cascade band [{low}, {high}] must satisfy 0 <= low <= threshold "
+                    f"({self._threshold}) <= high <= 1"
+                )
+            for name in ("match_type", "model_max_length", "window_overlap", "early_exit",
+                         "batch_max_size", "batch_max_wait_ms"):
+                if name in kwargs:
+                    cascade.setdefault(name, kwargs[name])
+            # Early exit in the small model can stop as soon as a chunk would block.
+            cascade["threshold"] = high
+            self._cascade = PromptInjectionScanner(**cascade)
+            self._cascade_band = (low, high)
+        warmup_lengths = kwargs.get("warmup_lengths", None)
+        self._warmup_lengths = sorted({
+            min(int(n), self._model_max_length)
+            for n in (config.DEFAULT_WARMUP_LENGTHS if warmup_lengths is None else warmup_lengths)
+        })
+        # Either a transformers Pipeline (torch) or an onnx_backend._OnnxClassifier;
+        # both are called as pipe(texts, batch_size=n) and expose .tokenizer.
+        self._pipe = None
+        self._model_config = None
         self._injection_label_missing_warned = False
 
-    def load(self):
-        """Load the HuggingFace pipeline and validate the injection label exists."""
-        logger.info("loading model", extra={"model": self._model})
-        self._pipe = pipeline(
-            "text-classification",
-            model=self._model,
-            device=-1,
-            truncation=True,
-            max_length=self._model_max_length,
-            top_k=None,
+    @property
+    def batchers(self) -> int:
+        """Micro-batcher threads running this scanner's forward passes, cascade included."""
+        cascade = self._cascade.batchers if self._cascade is not None else 0
+        return int(self._batcher.enabled) + cascade
+
+    @property
+    def model_key(self) -> tuple:
+        """Params that determine the loaded model; equal keys can share one instance."""
+        return (
+            self._model,
+            self._backend,
+            self._model_max_length,
+            self._intra_op_threads,
+            self._compile,
         )
+
+    def load(self, reuse: Optional["PromptInjectionScanner"] = None):
+        """
+        Load the model backend and validate the injection label exists.
+
+        Args:
+            reuse: A loaded scanner with the same model_key whose model is
+                shared instead of loading another copy (used on config reload).
+        """
+        # reuse is another instance of this class.
+        # pylint: disable=protected-access
+        if reuse is not None and reuse.model_key == self.model_key and reuse._pipe is not None:
+            logger.info(
+                "reusing loaded model", extra={"model": self._model, "backend": self._backend}
+            )
+            self._pipe = reuse._pipe
+            self._model_config = reuse._model_config
+        else:
+            self._load_backend()
+        self._validate()
+        if self._cascade is not None:
+            self._cascade.load(reuse=reuse._cascade if reuse is not None else None)
+        logger.info("model ready")
+
+    def warmup(self):
+        """Run warmup_lengths through the model so first requests skip one-off init costs.
+
+        Scores go straight to the model, not through the micro-batcher, so
+        each configured batch shape is exercised exactly.
+        """
+        for length in self._warmup_lengths:
+            text = " ".join(["warmup"] * length)
+            for batch in sorted({1, self._batch_max_size}):
+                self._score_batch([text] * batch)
+        if self._cascade is not None:
+            self._cascade.warmup()
+
+    def close(self):
+        """Stop the micro-batcher thread; the model itself may still be shared."""
+        self._batcher.close()
+        if self._cascade is not None:
+            self._cascade.close()
+
+    def _load_backend(self):
+        """Load the transformers pipeline or ONNX classifier for this scanner."""
+        logger.info("loading model", extra={"model": self._model, "backend": self._backend})
+        if self._backend == "torch":
+            pipe: Pipeline = pipeline(
+                "text-classification",
+                model=self._model,
+                device=-1,
+                truncation=True,
+                max_length=self._model_max_length,
+                top_k=None,
+                pipeline_class=_TracedTextClassificationPipeline,
+            )
+            self._model_config = pipe.model.config
+            if self._compile:
+                os.environ["TORCHINDUCTOR_CACHE_DIR"] = config.TORCH_COMPILE_CACHE_DIR
+                os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+                import torch  # pylint: disable=import-outside-toplevel
+
+                pipe.model = torch.compile(pipe.model, dynamic=True)
+        else:
+            # Imported lazily so torch-only deployments never load onnxruntime.
+            from onnx_backend import _OnnxClassifier  # pylint: disable=import-outside-toplevel
+            pipe = _OnnxClassifier(
+                self._model,
+                quantize=self._backend == "onnx-int8",
+                max_length=self._model_max_length,
+                intra_op_threads=self._intra_op_threads
+                or inference.intra_op_threads(self._batcher.enabled),
+            )
+            self._model_config = pipe.config
+        self._pipe = pipe
+
+    def _validate(self):
+        """Check the loaded model supports this scanner's match type and label."""
+        if self._match_type == "window" and not self._pipe.tokenizer.is_fast:
+            raise RuntimeError(
+                f"match_type 'window' needs a fast tokenizer with offset mapping; "
+                f"model {self._model!r} has none"
+            )
+        # Windows are used by match_type 'window' and by every stream.
+        if self._window_overlap >= self._window_size():
+            raise ValueError(
+                f"window_overlap ({self._window_overlap}) must be below the window size "
+                f"({self._window_size()} tokens: model_max_length less special tokens)"
+            )
         known_labels = self._known_labels()
         if known_labels and self._injection_label not in known_labels:
             raise RuntimeError(
@@ -80,11 +397,10 @@ class PromptInjectionScanner:
                 "model exposes no label map; skipping injection_label validation",
                 extra={"injection_label": self._injection_label},
             )
-        logger.info("model ready")
 
     def _known_labels(self) -> set:
         """Return the model's label names from label2id or id2label, if any."""
-        cfg = self._pipe.model.config
+        cfg = self._model_config
         label2id = getattr(cfg, "label2id", None)
         if label2id:
             return set(label2id.keys())
@@ -93,12 +409,8 @@ class PromptInjectionScanner:
             return set(id2label.values())
         return set()
 
-    def _score_text(self, text: str) -> float:
-        """Return injection score [0,1] for a single text chunk."""
-        if self._pipe is None:
-            raise RuntimeError("PromptInjectionScanner not loaded; call load() first")
-        results = self._pipe(text)
-        flat = results[0] if results and isinstance(results[0], list) else results
+    def _injection_score(self, flat: list) -> float:
+        """Pick the injection label's score out of one text's pipeline output."""
         scores = {r["label"]: r["score"] for r in flat}
         if self._injection_label not in scores and not self._injection_label_missing_warned:
             # Fail-open: a missing label means every prompt scores 0.0. Warn
@@ -111,12 +423,110 @@ class PromptInjectionScanner:
             self._injection_label_missing_warned = True
         return scores.get(self._injection_label, 0.0)
 
+    def _score_batch(self, texts: list) -> list:
+        """Return injection scores [0,1] for texts, run as padded forward passes.
+
+        Texts are sorted by length before the pipeline call so each padded
+        batch holds similarly sized inputs; scores come back in input order.
+        """
+        if self._pipe is None:
+            raise RuntimeError("PromptInjectionScanner not loaded; call load() first")
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = self._pipe(
+            [texts[i] for i in order],
+            batch_size=min(len(texts), self._batch_max_size),
+        )
+        scores = [0.0] * len(texts)
+        for i, r in zip(order, results):
+            scores[i] = self._injection_score(r if isinstance(r, list) else [r])
+        return scores
+
+    def _max_score(self, texts: list) -> float:
+        """Return the highest injection score across texts.
+
+        Without early exit all texts go to the batcher in one submission. With
+        it, texts are submitted one length bucket at a time and scoring stops
+        at the first bucket that reaches the threshold.
+        """
+        if not self._early_exit or len(texts) <= self._batch_max_size:
+            return max(self._batcher.submit(texts))
+        ordered = sorted(texts, key=len)
+        best = 0.0
+        for start in range(0, len(ordered), self._batch_max_size):
+            best = max(best, *self._batcher.submit(ordered[start:start + self._batch_max_size]))
+            if best >= self._threshold:
+                break
+        return best
+
+    def _score_text(self, text: str) -> float:
+        """Return injection score [0,1] for a single text chunk.
+
+        Goes through the micro-batcher so concurrent requests share a forward pass.
+        """
+        return self._batcher.submit([text])[0]
+
     @staticmethod
     def _split_sentences(text: str) -> list:
         """Split text into sentences on .  !  ? boundaries."""
         parts = re.split(r"(?<=[.!?])\s+", text.strip())
         return [p for p in parts if p]
 
+    def _offsets(self, text: str) -> list:
+        """Return the (start, end) character span of each token of text."""
+        return self._pipe.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )["offset_mapping"]
+
+    def _window_size(self) -> int:
+        """Tokens of text that fit in one forward pass alongside the special tokens."""
+        special = self._pipe.tokenizer.num_special_tokens_to_add(pair=False)
+        return max(1, self._model_max_length - special)
+
+    def _split_windows(self, text: str) -> list:
+        """Split text into overlapping windows of at most model_max_length tokens.
+
+        The text is tokenized once with character offsets; each window is the
+        slice of text covering its token span, so the total work is linear in
+        the prompt length. Text that fits in one window is returned unchanged.
+
+        Windows are returned as text and tokenized again when scored, so a
+        long prompt is tokenized about twice (plus the overlap). That keeps
+        windows on the same micro-batcher, pipeline and backends as whole
+        texts, all of which take strings; tokenization is small next to the
+        forward passes.
+        """
+        offsets = self._offsets(text)
+        size = self._window_size()
+        if len(offsets) <= size:
+            return [text]
+        step = max(1, size - self._window_overlap)
+        windows = []
+        for start in range(0, len(offsets), step):
+            end = min(start + size, len(offsets))
+            windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end == len(offsets):
+                break
+        return windows
+
+    def _model_score(self, text: str) -> float:
+        """Return this scanner's own model score for text, per match_type."""
+        if self._match_type == "sentence":
+            return self._max_score(self._split_sentences(text) or [text])
+        if self._match_type == "window":
+            if self._pipe is None:
+                raise RuntimeError("PromptInjectionScanner not loaded; call load() first")
+            return self._max_score(self._split_windows(text))
+        return self._score_text(text)
+
+    def _model_scores(self, texts: list) -> list:
+        """Return this scanner's own model score for each text, sharing forward passes."""
+        if self._match_type != "full":
+            return [self._model_score(t) for t in texts]
+        return self._batcher.submit(texts)
+
     def scan(self, text: str) -> ScanResult:
         """
         Scan text for prompt injection.
@@ -124,12 +534,48 @@ class PromptInjectionScanner:
         Returns:
             ScanResult with is_safe=True if injection score is below threshold.
         """
-        if self._match_type == "sentence":
-            sentences = self._split_sentences(text) or [text]
-            injection_score = max(self._score_text(s) for s in sentences)
-        else:
-            injection_score = self._score_text(text)
+        return self.scan_batch([text])[0]
 
+    def scan_batch(self, texts: list) -> list:
+        """
+        Scan several independent texts, sharing forward passes between them.
+
+        With a cascade, every text is scored by the small model first and
+        only those inside the uncertainty band are scored again here.
+
+        Returns:
+            list: One ScanResult per text, in input order.
+        """
+        if self._cascade is None:
+            return [self._result(score) for score in self._model_scores(texts)]
+        small = self._cascade._model_scores(texts)  # pylint: disable=protected-access
+        low, high = self._cascade_band
+        uncertain = [i for i, score in enumerate(small) if low <= score < high]
+        large = dict(
+            zip(uncertain, self._model_scores([texts[i] for i in uncertain]) if uncertain else [])
+        )
+        metrics.CASCADE_DECISIONS.labels("small").inc(len(texts) - len(uncertain))
+        metrics.CASCADE_DECISIONS.labels("large").inc(len(uncertain))
+        results = []
+        for i, small_score in enumerate(small):
+            stages = {"PromptInjection[small]": round(small_score, 4)}
+            if i in large:
+                stages["PromptInjection[large]"] = round(large[i], 4)
+            result = self._result(large.get(i, small_score))
+            result.stage_scores = stages
+            results.append(result)
+        return results
+
+    def open_stream(self) -> _InjectionStream:
+        """Return per-stream state for scanning text that arrives in chunks."""
+        if self._pipe is None:
+            raise RuntimeError("PromptInjectionScanner not loaded; call load() first")
+        if not self._pipe.tokenizer.is_fast:
+            raise RuntimeError(f"streaming needs a fast tokenizer; model {self._model!r} has none")
+        return _InjectionStream(self)
+
+    def _result(self, injection_score: float) -> ScanResult:
+        """Build the ScanResult for an injection score."""
         is_safe = injection_score < self._threshold
         return ScanResult(
             scanner="PromptInjection",
@@ -144,12 +590,19 @@ class PromptInjectionScanner:
 class RegexScanner:
     """Blocks text matching configurable regex patterns (e.g. credential leakage)."""
 
-    def __init__(
+    cost = 2.0
+    model_backed = False
+    # Micro-batcher threads running forward passes (see inference.set_batchers()).
+    batchers = 0
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         patterns: Optional[list] = None,
         is_blocked: bool = True,
         match_type: str = "search",
         redact: bool = False,
+        engine: str = "re",
+        stream_overlap: Optional[int] = None,
     ):
         """
         Initialise the scanner.
@@ -158,38 +611,182 @@ class RegexScanner:
             patterns: List of regex pattern strings to match.
             is_blocked: If True, a match means the text is unsafe.
             match_type: ``"search"`` (anywhere in text) or ``"fullmatch"`` (whole string).
-            redact: Unused; kept for config compatibility.
+            redact: Replace every blocked match with ``[REDACTED]`` in the sanitized
+                text, in the same pass that detects it. Only applies with
+                ``is_blocked`` and ``match_type: search``.
+            engine: ``"re"`` searches each pattern in turn, which lets CPython's
+                ``re`` use its literal-prefix fast path and is usually quickest;
+                ``"combined"`` compiles all patterns into one alternation so
+                each text is scanned once (only faster for a few prefix-less
+                patterns, see tools/bench.py); ``"hyperscan"`` uses the optional
+                hyperscan multi-pattern automaton (search only).
+            stream_overlap: Characters of the previous chunk rescanned with each
+                new one when streaming, so matches spanning a chunk boundary
+                are found; a match longer than this can be split and missed.
+                Defaults to config.DEFAULT_STREAM_OVERLAP.
         """
-        self._compiled = [re.compile(p) for p in (patterns or [])]
+        if match_type not in ("search", "fullmatch"):
+            raise ValueError(f"Unknown match_type: {match_type!r}")
+        if engine not in _REGEX_ENGINES:
+            raise ValueError(
+                f"Unknown engine: {engine!r}; expected one of {sorted(_REGEX_ENGINES)}"
+            )
+        # Checked here so a config naming it fails when it is parsed, not at load().
+        if engine == "hyperscan" and importlib.util.find_spec("hyperscan") is None:
+            raise RuntimeError(
+                "Regex engine 'hyperscan' requires the hyperscan package (pip install hyperscan)"
+            )
+        self._patterns = list(patterns or [])
+        self._compiled = [re.compile(p) for p in self._patterns]
         self._is_blocked = is_blocked
         self._match_type = match_type
-        self._redact = redact
+        self._redact = redact and is_blocked and match_type == "search"
+        self._engine = engine
+        self._stream_overlap = int(
+            config.DEFAULT_STREAM_OVERLAP if stream_overlap is None else stream_overlap
+        )
+        self._combined: Optional[re.Pattern] = None
+        self._hyperscan = None
+        # A hyperscan scratch space may be used by one scan at a time, and
+        # scans run on several executor threads: each thread allocates its own.
+        self._hyperscan_scratch = threading.local()
+        self._new_scratch = None
+        # A single pass can only answer "does any pattern match", which is the
+        # blocklist question; an allowlist needs every pattern checked.
+        if is_blocked and self._compiled:
+            if engine == "hyperscan":
+                if match_type != "search":
+                    raise ValueError("engine 'hyperscan' supports only match_type 'search'")
+            elif engine == "combined":
+                self._combined = _combine_patterns(self._patterns)
+                if self._combined is None:
+                    logger.warning(
+                        "regex patterns cannot be combined; scanning one pattern at a time",
+                        extra={"patterns": len(self._patterns)},
+                    )
 
     def load(self):
-        """No-op; patterns are compiled at init."""
+        """Compile the hyperscan database if that engine is selected."""
+        if self._engine != "hyperscan" or not self._is_blocked or not self._patterns:
+            return
+        import hyperscan  # pylint: disable=import-outside-toplevel
+
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode("utf-8") for p in self._patterns],
+            ids=list(range(len(self._patterns))),
+            elements=len(self._patterns),
+            flags=[hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SOM_LEFTMOST]
+            * len(self._patterns),
+        )
+        self._new_scratch = hyperscan.Scratch
+        self._hyperscan = db
+
+    def scan_batch(self, texts: list) -> list:
+        """Scan several independent texts; one ScanResult per text."""
+        return [self.scan(t) for t in texts]
+
+    def _blocked(self, pattern: str, sanitized: Optional[str] = None) -> ScanResult:
+        """Build the result for a text that matched a blocked pattern."""
+        return ScanResult(
+            scanner="Regex",
+            is_safe=False,
+            score=1.0,
+            reason=f"matched blocked pattern: {pattern!r}",
+            sanitized=sanitized,
+        )
+
+    def _scan_combined(self, text: str) -> Optional[ScanResult]:
+        """Single-pass scan with the combined alternation; None if nothing matched."""
+        if self._redact:
+            first: list = []
+
+            def _sub(m: re.Match) -> str:
+                if not first:
+                    first.append(m.lastgroup)
+                return _REDACTED
+
+            sanitized = self._combined.sub(_sub, text)
+            if first:
+                return self._blocked(self._patterns[int(first[0][2:])], sanitized)
+            return None
+        if self._match_type == "search":
+            m = self._combined.search(text)
+        else:
+            m = self._combined.fullmatch(text)
+        if m is None:
+            return None
+        return self._blocked(self._patterns[int(m.lastgroup[2:])])
+
+    def _scan_redacting(self, text: str) -> Optional[ScanResult]:
+        """Collect every pattern's matches and redact them together; None if none matched."""
+        spans: list = []
+        first = None
+        for pat in self._compiled:
+            found = [m.span() for m in pat.finditer(text)]
+            if found:
+                spans.extend(found)
+                if first is None:
+                    first = pat.pattern
+        if first is None:
+            return None
+        return self._blocked(first, _redact_spans(text, spans, _REDACTED))
+
+    def _scan_hyperscan(self, text: str) -> Optional[ScanResult]:
+        """Single-pass scan with the hyperscan database; None if nothing matched."""
+        data = text.encode("utf-8", "surrogatepass")
+        spans: list = []
+
+        def _on_match(pattern_id, start, end, _flags, _context):
+            spans.append((start, end, pattern_id))
+            # Returning True stops the scan; keep going only to collect spans to redact.
+            return not self._redact
+
+        scratch = getattr(self._hyperscan_scratch, "scratch", None)
+        if scratch is None:
+            scratch = self._hyperscan_scratch.scratch = self._new_scratch(self._hyperscan)
+        self._hyperscan.scan(data, match_event_handler=_on_match, scratch=scratch)
+        if not spans:
+            return None
+        spans.sort()
+        pattern = self._patterns[spans[0][2]]
+        if not self._redact:
+            return self._blocked(pattern)
+        out = _redact_spans(data, _merge_per_pattern(spans), _REDACTED.encode("utf-8"))
+        return self._blocked(pattern, out.decode("utf-8", "surrogatepass"))
+
+    def open_stream(self) -> _RegexStream:
+        """Return per-stream state for scanning text that arrives in chunks."""
+        return _RegexStream(self, self._stream_overlap)
 
     def scan(self, text: str) -> ScanResult:
         """
         Scan text against configured regex patterns.
 
         Returns:
-            ScanResult with is_safe=False if a blocking pattern matches.
+            ScanResult with is_safe=False if a blocking pattern matches; with
+            ``redact`` its ``sanitized`` field holds the redacted text.
         """
+        if self._hyperscan is not None:
+            result = self._scan_hyperscan(text)
+        elif self._combined is not None:
+            result = self._scan_combined(text)
+        elif self._redact:
+            result = self._scan_redacting(text)
+        else:
+            return self._scan_each(text)
+        return result or ScanResult(scanner="Regex", is_safe=True, score=0.0)
+
+    def _scan_each(self, text: str) -> ScanResult:
+        """Try each pattern in turn, stopping at the first that decides the verdict."""
         for pat in self._compiled:
             if self._match_type == "search":
                 matched = pat.search(text) is not None
-            elif self._match_type == "fullmatch":
-                matched = pat.fullmatch(text) is not None
             else:
-                raise ValueError(f"Unknown match_type: {self._match_type!r}")
+                matched = pat.fullmatch(text) is not None
             if self._is_blocked:
                 if matched:
-                    return ScanResult(
-                        scanner="Regex",
-                        is_safe=False,
-                        score=1.0,
-                        reason=f"matched blocked pattern: {pat.pattern!r}",
-                    )
+                    return self._blocked(pat.pattern)
             else:
                 if not matched:
                     return ScanResult(
@@ -204,8 +801,28 @@ class RegexScanner:
 class InvisibleTextScanner:
     """Detects invisible/zero-width Unicode characters used in injection attacks."""
 
+    cost = 1.0
+    model_backed = False
+    batchers = 0
+
     def load(self):
-        """No-op; no resources to load."""
+        """Build the character class now, before traffic, and log its Unicode version."""
+        invisible_pattern()
+        logger.info(
+            "invisible text class ready",
+            extra={
+                "unicode_version": unicodedata.unidata_version,
+                "codepoints": _INVISIBLE["count"],
+            },
+        )
+
+    def scan_batch(self, texts: list) -> list:
+        """Scan several independent texts; one ScanResult per text."""
+        return [self.scan(t) for t in texts]
+
+    def open_stream(self) -> _ChunkStream:
+        """Return per-stream state; each character is judged alone, so chunks need no overlap."""
+        return _ChunkStream(self)
 
     def scan(self, text: str) -> ScanResult:
         """
@@ -214,17 +831,18 @@ class InvisibleTextScanner:
         Returns:
             ScanResult with is_safe=False if invisible characters are found.
         """
-        found = [
-            ch for ch in text
-            if ord(ch) in _INVISIBLE_CODEPOINTS
-            or unicodedata.category(ch) in _INVISIBLE_CATEGORIES
-        ]
-        if found:
-            codepoints = ", ".join(f"U+{ord(c):04X}" for c in set(found))
-            return ScanResult(
-                scanner="InvisibleText",
-                is_safe=False,
-                score=1.0,
-                reason=f"invisible characters detected: {codepoints}",
-            )
-        return ScanResult(scanner="InvisibleText", is_safe=True, score=0.0)
+        # No format character is ASCII, and isascii() is a near-free C check.
+        if text.isascii():
+            return ScanResult(scanner="InvisibleText", is_safe=True, score=0.0)
+        pattern = invisible_pattern()
+        first = pattern.search(text)
+        if first is None:
+            return ScanResult(scanner="InvisibleText", is_safe=True, score=0.0)
+        found = set(pattern.findall(text, first.start()))
+        codepoints = ", ".join(f"U+{ord(c):04X}" for c in sorted(found))
+        return ScanResult(
+            scanner="InvisibleText",
+            is_safe=False,
+            score=1.0,
+            reason=f"invisible characters detected: {codepoints}",
+        )
@@ -0,0 +1,210 @@
+"""Embedding-similarity pre-filter against known attacks and known-good prompts."""
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+from transformers import AutoModel, AutoTokenizer
+
+import config
+import profiler
+import tracing
+from batching import _MicroBatcher
+from results import ScanResult
+from streams import _BufferedStream
+
+logger = logging.getLogger(__name__)
+
+
+def load_encoder(model: str) -> tuple:
+    """Load (tokenizer, encoder) for a sentence-embedding model."""
+    logger.info("loading embedding model", extra={"model": model})
+    return AutoTokenizer.from_pretrained(model), AutoModel.from_pretrained(model).eval()
+
+
+def embed(tokenizer, encoder, texts: list, max_length: int) -> np.ndarray:
+    """
+    Return L2-normalised mean-pooled embeddings, one float32 row per text.
+
+    Shared by EmbeddingSimilarityScanner and tools/build_similarity_index.py
+    so index and query vectors are computed identically.
+    """
+    import torch  # pylint: disable=import-outside-toplevel
+
+    with tracing.span("tokenize"):
+        enc = tokenizer(
+            texts, padding=True, truncation=True, max_length=max_length, return_tensors="pt"
+        )
+    with (
+        tracing.span("forward"),
+        profiler.forward(encoder.config.name_or_path),
+        torch.inference_mode(),
+    ):
+        hidden = encoder(**enc).last_hidden_state
+    mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    return torch.nn.functional.normalize(pooled, dim=-1).numpy().astype(np.float32)
+
+
+def _nearest(queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Return each query's best cosine similarity to vectors; zeros if there are none."""
+    return (queries @ vectors.T).max(axis=1) if len(vectors) else np.zeros(len(queries))
+
+
+class EmbeddingSimilarityScanner:
+    """Matches prompts against an embedding index of known attacks and known-good prompts.
+
+    A prompt whose nearest known attack is at least ``block_cutoff`` similar
+    is blocked without running later scanners; optionally, one at least
+    ``allow_cutoff`` similar to a known-good prompt skips the later
+    model-backed scanners (cheap ones such as Regex still run).
+    Anything in between is left to the scanners that follow, so list this
+    one before PromptInjection (or rely on its lower ``cost`` in fail_fast).
+    """
+
+    cost = 20.0
+    model_backed = True
+
+    def __init__(self, **kwargs):
+        """
+        Initialise the scanner from keyword arguments.
+
+        Kwargs:
+            index (str): Path prefix of an index built by
+                tools/build_similarity_index.py (``<index>.npy``,
+                ``<index>.json``). Required.
+            model (str): Embedding model; must be the one the index was built
+                with. Defaults to the model recorded in the index.
+            block_cutoff (float): Cosine similarity to a known attack at or above
+                which the prompt is blocked. Defaults to
+                config.DEFAULT_SIMILARITY_BLOCK_CUTOFF.
+            allow_cutoff (float): Cosine similarity to a known-good prompt at or
+                above which the later model-backed scanners are skipped.
+                Defaults to None (never short-circuit an allow).
+            model_max_length (int): Max tokens embedded per prompt. Defaults to
+                the length recorded in the index.
+            batch_max_size (int): Max texts per batched forward pass; ``1`` disables
+                micro-batching. Defaults to config.DEFAULT_BATCH_MAX_SIZE.
+            batch_max_wait_ms (float): Max time a text waits for concurrent texts.
+                Defaults to config.DEFAULT_BATCH_MAX_WAIT_MS.
+        """
+        self._index_path = kwargs.get("index", "")
+        if not self._index_path:
+            raise ValueError("EmbeddingSimilarity requires an 'index' path")
+        with open(f"{self._index_path}.json", encoding="utf-8") as fh:
+            self._meta = json.load(fh)
+        self._model = kwargs.get("model", "") or self._meta["model"]
+        if self._model != self._meta["model"]:
+            raise ValueError(
+                f"index {self._index_path!r} was built with {self._meta['model']!r}, "
+                f"not {self._model!r}"
+            )
+        self._max_length = int(kwargs.get("model_max_length", 0)) or self._meta["max_length"]
+        block_cutoff = kwargs.get("block_cutoff", None)
+        self._block_cutoff = float(
+            config.DEFAULT_SIMILARITY_BLOCK_CUTOFF if block_cutoff is None else block_cutoff
+        )
+        allow_cutoff = kwargs.get("allow_cutoff", None)
+        self._allow_cutoff = None if allow_cutoff is None else float(allow_cutoff)
+        self._batcher = _MicroBatcher.from_params(self._embed, kwargs)
+        self._batch_max_size = self._batcher.max_batch_size
+        self._tokenizer = None
+        self._encoder = None
+        self._attacks = None
+        self._known_good = None
+
+    @property
+    def batchers(self) -> int:
+        """Micro-batcher threads running this scanner's forward passes."""
+        return int(self._batcher.enabled)
+
+    @property
+    def model_key(self) -> tuple:
+        """Params that determine the loaded model; equal keys can share one instance."""
+        return "embedding", self._model
+
+    def load(self, reuse: Optional["EmbeddingSimilarityScanner"] = None):
+        """
+        Load the embedding model and memory-map the index.
+
+        Args:
+            reuse: A loaded scanner with the same model_key whose encoder is
+                shared instead of loading another copy.
+        """
+        # reuse is another instance of this class.
+        # pylint: disable=protected-access
+        if reuse is not None and reuse.model_key == self.model_key and reuse._encoder is not None:
+            self._tokenizer, self._encoder = reuse._tokenizer, reuse._encoder
+        else:
+            self._tokenizer, self._encoder = load_encoder(self._model)
+        # Memory-mapped read-only: pages are shared between processes and
+        # with the page cache, and only touched rows are read from disk.
+        vectors = np.load(f"{self._index_path}.npy", mmap_mode="r")
+        if vectors.shape[1] != self._meta["dim"]:
+            raise RuntimeError(f"index {self._index_path!r} dimension does not match its metadata")
+        # The build tool stores known attacks first, then known-good prompts,
+        # so each group is a contiguous view rather than a copy.
+        n_attacks = self._meta["attacks"]
+        self._attacks = vectors[:n_attacks]
+        self._known_good = vectors[n_attacks:]
+        logger.info(
+            "similarity index ready",
+            extra={"index": self._index_path, "attacks": n_attacks,
+                   "known_good": len(self._known_good), "dim": vectors.shape[1]},
+        )
+
+    def _embed(self, texts: list) -> list:
+        """Batcher callback: embed length-sorted texts, returning rows in input order."""
+        if self._encoder is None:
+            raise RuntimeError("EmbeddingSimilarityScanner not loaded; call load() first")
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        rows = embed(self._tokenizer, self._encoder, [texts[i] for i in order], self._max_length)
+        out: list = [None] * len(texts)
+        for i, row in zip(order, rows):
+            out[i] = row
+        return out
+
+    def warmup(self):
+        """Run one batch through the encoder so first requests skip one-off init costs."""
+        self._embed(["warmup"] * self._batch_max_size)
+
+    def close(self):
+        """Stop the micro-batcher thread; the model itself may still be shared."""
+        self._batcher.close()
+
+    def scan_batch(self, texts: list) -> list:
+        """Scan several texts with one similarity search; one ScanResult per text."""
+        queries = np.stack(self._batcher.submit(texts))
+        best_attack = _nearest(queries, self._attacks)
+        best_good = _nearest(queries, self._known_good)
+        return [self._result(float(a), float(g)) for a, g in zip(best_attack, best_good)]
+
+    def scan(self, text: str) -> ScanResult:
+        """
+        Compare text with the index.
+
+        Returns:
+            ScanResult scored by the nearest known attack's similarity; conclusive
+            when either cutoff was reached.
+        """
+        return self.scan_batch([text])[0]
+
+    def open_stream(self) -> _BufferedStream:
+        """Return per-stream state; similarity is judged on the whole text at the end."""
+        return _BufferedStream(self, "EmbeddingSimilarity")
+
+    def _result(self, attack_similarity: float, good_similarity: float) -> ScanResult:
+        """Build the ScanResult for the nearest attack and known-good similarities."""
+        score = round(max(0.0, attack_similarity), 4)
+        if attack_similarity >= self._block_cutoff:
+            return ScanResult(
+                scanner="EmbeddingSimilarity",
+                is_safe=False,
+                score=score,
+                reason=f"similar to known attack ({attack_similarity:.4f} >= {self._block_cutoff})",
+                conclusive=True,
+            )
+        conclusive = self._allow_cutoff is not None and good_similarity >= self._allow_cutoff
+        return ScanResult(
+            scanner="EmbeddingSimilarity", is_safe=True, score=score, conclusive=conclusive
+        )
@@ -0,0 +1,135 @@
+"""Session-based scanning of streamed text (e.g. LLM responses).
+
+A client opens a session, posts chunks as they arrive and gets a verdict
+after each one. Every scanner keeps its own incremental state (see
+``open_stream`` in scanner_types), so each chunk is scanned once instead of
+rescanning the growing text, and a block can be signalled mid-stream.
+
+Sessions live in the worker process that created them. With WORKERS>1
+consecutive requests may reach different workers, so streaming clients need
+WORKERS=1 or a sticky route to one worker; other workers answer 404.
+
+Scanners with a normalized ``view`` get each chunk normalized on its own,
+so a combining mark at the very start of a chunk is not composed with the
+character that ended the previous one.
+"""
+import threading
+import time
+import uuid
+from typing import Optional
+
+import config
+import pipeline
+from normalization import TextViews
+
+_SESSIONS: dict = {}
+_LOCK = threading.Lock()
+
+
+class SessionTooLarge(ValueError):
+    """Raised when a chunk would take a session past STREAM_MAX_SESSION_BYTES."""
+
+
+class _Session:  # pylint: disable=too-few-public-methods
+    """Per-scanner stream states for one streamed text."""
+
+    def __init__(self):
+        """Open stream state for every scanner of the current pipeline."""
+        # Bound to the pipeline live at open time; a reload mid-stream does
+        # not change the scanners a stream is judged by.
+        self.streams = pipeline.open_stream()
+        self.last_used = time.monotonic()
+        # Chunks must be applied in order; a client posting concurrently
+        # for one session is serialised here.
+        self.lock = threading.Lock()
+        self.closed = False
+        self.size = 0
+
+    def feed(self, chunk: str, final: bool) -> tuple:
+        """
+        Scan the next chunk, and end the stream if final.
+
+        Scanners run in config order and stop at the first block, which
+        closes the session.
+
+        Returns:
+            tuple: (is_safe, scores_dict, blocked_reason, done)
+
+        Raises:
+            KeyError: The session is closed.
+            SessionTooLarge: The chunk would exceed STREAM_MAX_SESSION_BYTES;
+                the session is closed without scanning it.
+        """
+        with self.lock:
+            if self.closed:
+                raise KeyError("session closed")
+            self.size += len(chunk.encode("utf-8", "surrogatepass"))
+            if config.STREAM_MAX_SESSION_BYTES and self.size > config.STREAM_MAX_SESSION_BYTES:
+                self.closed = True
+                raise SessionTooLarge(f"stream exceeds {config.STREAM_MAX_SESSION_BYTES} bytes")
+            views = TextViews(chunk)
+            results = []
+            for _, stream, view in self.streams:
+                result = stream.feed(views.get(view)) if chunk else None
+                if final and (result is None or result.is_safe):
+                    result = stream.finish()
+                if result is None:
+                    result = stream.feed("")
+                results.append(result)
+                if not result.is_safe:
+                    break
+            skipped = [name for name, _, _ in self.streams[len(results):]]
+            is_safe, scores, reason, _ = pipeline._verdict(results, skipped)  # pylint: disable=protected-access
+            self.closed = final or not is_safe
+            self.last_used = time.monotonic()
+            return is_safe, scores, reason, self.closed
+
+
+def _expire(now: float):
+    """Drop sessions idle for longer than STREAM_SESSION_TTL_SECONDS; caller holds _LOCK."""
+    for session_id in [k for k, s in _SESSIONS.items()
+                       if s.closed or now - s.last_used > config.STREAM_SESSION_TTL_SECONDS]:
+        del _SESSIONS[session_id]
+
+
+def open_session() -> Optional[str]:
+    """Create a session; return its id, or None if STREAM_MAX_SESSIONS are open."""
+    session = _Session()
+    with _LOCK:
+        _expire(time.monotonic())
+        if len(_SESSIONS) >= config.STREAM_MAX_SESSIONS:
+            return None
+        session_id = uuid.uuid4().hex
+        _SESSIONS[session_id] = session
+    return session_id
+
+
+def feed(session_id: str, chunk: str, final: bool) -> tuple:
+    """
+    Scan the next chunk of a session; blocking call, run it on the inference executor.
+
+    Raises:
+        KeyError: Unknown, expired or already finished session.
+        SessionTooLarge: The session passed STREAM_MAX_SESSION_BYTES and was closed.
+    """
+    with _LOCK:
+        session = _SESSIONS[session_id]
+        # Checked here too: a session idle past its TTL is gone even if no
+        # new session has been opened since to sweep it.
+        if time.monotonic() - session.last_used > config.STREAM_SESSION_TTL_SECONDS:
+            del _SESSIONS[session_id]
+            raise KeyError(session_id)
+    try:
+        verdict = session.feed(chunk, final)
+    except SessionTooLarge:
+        close(session_id)
+        raise
+    if verdict[3]:
+        close(session_id)
+    return verdict
+
+
+def close(session_id: str) -> bool:
+    """Discard a session; return False if it did not exist."""
+    with _LOCK:
+        return _SESSIONS.pop(session_id, None) is not None
@@ -0,0 +1,142 @@
+"""Incremental scanning of streamed text.
+
+A scanner's open_stream() returns one of these per stream. feed() takes the
+next chunk and finish() ends the stream; both return the scanner's verdict
+for all text seen so far, so an unsafe result can stop the stream mid-way.
+They are part of their scanner's implementation and read its private state.
+"""
+# pylint: disable=protected-access
+from typing import Optional
+
+from results import ScanResult
+
+
+class _ChunkStream:
+    """Stream state for scanners whose verdict needs no context across chunks."""
+
+    def __init__(self, scanner):
+        """Initialise for scanner."""
+        self._scanner = scanner
+        self._result: Optional[ScanResult] = None
+
+    def feed(self, chunk: str) -> ScanResult:
+        """Scan only the new chunk."""
+        result = self._scanner.scan(chunk)
+        if self._result is None or self._result.is_safe:
+            self._result = result
+        return self._result
+
+    def finish(self) -> ScanResult:
+        """Return the verdict for the whole stream."""
+        return self._result or self._scanner.scan("")
+
+
+class _BufferedStream:
+    """Stream state for scanners that need the whole text: it is scanned once, at finish()."""
+
+    def __init__(self, scanner, name: str):
+        """Initialise for scanner, whose results are reported under name."""
+        self._scanner = scanner
+        self._name = name
+        self._chunks: list = []
+
+    def feed(self, chunk: str) -> ScanResult:
+        """Keep the chunk; the verdict stays pending (safe) until finish()."""
+        self._chunks.append(chunk)
+        return ScanResult(scanner=self._name, is_safe=True, score=0.0)
+
+    def finish(self) -> ScanResult:
+        """Scan the whole stream."""
+        return self._scanner.scan("".join(self._chunks))
+
+
+class _RegexStream:
+    """Stream state for RegexScanner: each chunk is scanned with the previous chunk's tail."""
+
+    def __init__(self, scanner, overlap: int):
+        """Initialise for scanner, carrying overlap characters between chunks."""
+        self._scanner = scanner
+        self._overlap = overlap
+        self._tail = ""
+        # fullmatch is a property of the whole text; it is checked once at finish().
+        self._buffer: Optional[list] = [] if scanner._match_type == "fullmatch" else None
+        self._unmatched = list(scanner._compiled) if not scanner._is_blocked else []
+        self._result = ScanResult(scanner="Regex", is_safe=True, score=0.0)
+
+    def feed(self, chunk: str) -> ScanResult:
+        """Scan the new chunk plus the retained tail."""
+        if self._buffer is not None:
+            self._buffer.append(chunk)
+            return self._result
+        window = self._tail + chunk
+        self._tail = window[-self._overlap:] if self._overlap > 0 else ""
+        if self._scanner._is_blocked:
+            result = self._scanner.scan(window)
+            if not result.is_safe:
+                # Redaction cannot apply to text that was already streamed on.
+                self._result = ScanResult(
+                    scanner="Regex", is_safe=False, score=1.0, reason=result.reason
+                )
+        else:
+            self._unmatched = [p for p in self._unmatched if p.search(window) is None]
+        return self._result
+
+    def finish(self) -> ScanResult:
+        """Return the verdict for the whole stream."""
+        if self._buffer is not None:
+            result = self._scanner.scan("".join(self._buffer))
+            return ScanResult(
+                scanner="Regex", is_safe=result.is_safe, score=result.score, reason=result.reason
+            )
+        if self._result.is_safe and self._unmatched:
+            return ScanResult(
+                scanner="Regex",
+                is_safe=False,
+                score=1.0,
+                reason=f"did not match required pattern: {self._unmatched[0].pattern!r}",
+            )
+        return self._result
+
+
+class _InjectionStream:
+    """Stream state for PromptInjectionScanner: scores each token window once it is complete.
+
+    Only text from the start of the first unscored window is kept and
+    re-tokenized, so per-chunk work is bounded by the window size rather
+    than the length of the stream so far. Windows overlap by window_overlap
+    tokens, as with ``match_type: window``.
+    """
+
+    def __init__(self, scanner):
+        """Initialise for a loaded scanner."""
+        self._scanner = scanner
+        self._size = scanner._window_size()
+        self._step = max(1, self._size - scanner._window_overlap)
+        self._pending = ""
+        self._scored_any = False
+        self._best = 0.0
+
+    def feed(self, chunk: str) -> ScanResult:
+        """Append chunk and score every window it completed."""
+        self._pending += chunk
+        offsets = self._scanner._offsets(self._pending)
+        # A window is complete only once a later token exists: the last token
+        # may still grow when the next chunk continues the same word.
+        windows = []
+        start = 0
+        while start + self._size < len(offsets):
+            windows.append(self._pending[offsets[start][0]:offsets[start + self._size - 1][1]])
+            start += self._step
+        if windows:
+            self._best = max(self._best, *self._scanner._batcher.submit(windows))
+            self._scored_any = True
+            self._pending = self._pending[offsets[start][0]:]
+        return self._scanner._result(self._best)
+
+    def finish(self) -> ScanResult:
+        """Score the final, partial window if it holds unscored text."""
+        if self._pending.strip():
+            unscored = len(self._scanner._offsets(self._pending)) > self._scanner._window_overlap
+            if not self._scored_any or unscored:
+                self._best = max(self._best, *self._scanner._batcher.submit([self._pending]))
+        return self._scanner._result(self._best)
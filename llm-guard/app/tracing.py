@@ -0,0 +1,256 @@
+"""Per-request timing spans, returned as Server-Timing and optionally exported.
+
+A sampled request (TRACE_SAMPLE_RATE) gets a trace that collects spans from
+the HTTP middleware down through the inference executor, the pipeline and
+each scanner; unsampled requests pay one context-variable lookup per span.
+The summed duration of each span name is returned in the ``Server-Timing``
+response header. With TRACE_EXPORTER set, the spans are also handed to the
+OpenTelemetry SDK (an optional dependency, loaded only then) and written as
+JSON lines to TRACE_FILE or sent to an OTLP/HTTP collector configured by the
+standard ``OTEL_EXPORTER_OTLP_*`` variables.
+
+Executor threads see the request's trace because inference.run() submits
+work in a copy of the request context. The micro-batcher scores many
+requests in one pass on its own thread, so it collects that pass's spans
+once and copies them into every sampled request in the batch.
+"""
+import contextvars
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_EXPORTERS = frozenset({"none", "file", "otlp"})
+# Spans kept per trace for export; Server-Timing totals are kept regardless.
+_MAX_SPANS = 1000
+
+_STATE: dict = {"provider": None, "tracer": None}
+
+_TRACE: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+# Id of the innermost open span in this context: the parent of new spans.
+_PARENT: contextvars.ContextVar = contextvars.ContextVar("trace_parent", default=None)
+
+
+class _Trace:
+    """Spans of one request: per-name totals, plus the span tree when exporting."""
+
+    __slots__ = ("start", "totals", "spans", "_ids", "_lock", "_epoch_offset")
+
+    def __init__(self, keep_spans: bool):
+        """Start an empty trace at the current time."""
+        self.start = time.monotonic()
+        self._epoch_offset = time.time() - self.start
+        self.totals: dict = {}
+        # [span_id, parent_id, name, start, end, attributes], in start order.
+        self.spans: Optional[list] = [] if keep_spans else None
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def open(
+        self, parent: Optional[int], name: str, start: float, attributes: Optional[dict]
+    ) -> list:
+        """Add an unfinished span and return its entry."""
+        entry = [next(self._ids), parent, name, start, None, attributes]
+        if self.spans is not None:
+            with self._lock:
+                if len(self.spans) < _MAX_SPANS:
+                    self.spans.append(entry)
+        return entry
+
+    def close(self, entry: list, end: float):
+        """Finish a span and add its duration to its name's total."""
+        entry[4] = end
+        with self._lock:
+            self.totals[entry[2]] = self.totals.get(entry[2], 0.0) + end - entry[3]
+
+    def epoch_ns(self, t: float) -> int:
+        """Convert a time.monotonic() value from this trace to epoch nanoseconds."""
+        return int((t + self._epoch_offset) * 1e9)
+
+
+def setup():
+    """Create the OpenTelemetry exporter selected by TRACE_EXPORTER; call once per process."""
+    if config.TRACE_EXPORTER not in _EXPORTERS:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {config.TRACE_EXPORTER!r}")
+    if config.TRACE_EXPORTER == "none" or _STATE["provider"] is not None:
+        return
+    # pylint: disable=import-outside-toplevel
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError as exc:
+        raise RuntimeError(
+            "TRACE_EXPORTER requires the OpenTelemetry SDK (pip install opentelemetry-sdk)"
+        ) from exc
+    if config.TRACE_EXPORTER == "file":
+        if not config.TRACE_FILE:
+            raise ValueError("TRACE_EXPORTER=file requires TRACE_FILE")
+        # Line-buffered so each span is on disk once the processor writes it.
+        out = open(config.TRACE_FILE, "a", encoding="utf-8", buffering=1)  # pylint: disable=consider-using-with
+        exporter = ConsoleSpanExporter(
+            out=out, formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError as exc:
+            raise RuntimeError(
+                "TRACE_EXPORTER=otlp requires opentelemetry-exporter-otlp-proto-http"
+            ) from exc
+        exporter = OTLPSpanExporter()
+    provider = TracerProvider(resource=Resource.create({"service.name": config.TRACE_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    _STATE["provider"] = provider
+    _STATE["tracer"] = provider.get_tracer(__name__)
+    logger.info("trace export enabled", extra={"exporter": config.TRACE_EXPORTER,
+                                               "sample_rate": config.TRACE_SAMPLE_RATE})
+
+
+def shutdown():
+    """Flush spans still queued for export."""
+    provider = _STATE["provider"]
+    _STATE["provider"] = _STATE["tracer"] = None
+    if provider is not None:
+        provider.shutdown()
+
+
+def begin() -> Optional[_Trace]:
+    """Return a new trace if this request is sampled, else None."""
+    rate = config.TRACE_SAMPLE_RATE
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    return _Trace(keep_spans=_STATE["tracer"] is not None)
+
+
+@contextmanager
+def request(trace: Optional[_Trace], name: str, attributes: Optional[dict] = None):
+    """
+    Make trace current for the enclosed request, timed as its root span.
+
+    Args:
+        trace: From begin(); None makes this a no-op.
+        name: Root span name.
+        attributes: Root span attributes; may still be updated until the block exits.
+    """
+    if trace is None:
+        yield
+        return
+    root = trace.open(None, name, trace.start, attributes)
+    trace_token = _TRACE.set(trace)
+    parent_token = _PARENT.set(root[0])
+    try:
+        yield
+    finally:
+        _PARENT.reset(parent_token)
+        _TRACE.reset(trace_token)
+        root[4] = time.monotonic()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[dict] = None):
+    """Time the enclosed block as a child of the current span, if the request is sampled."""
+    trace = _TRACE.get()
+    if trace is None:
+        yield
+        return
+    entry = trace.open(_PARENT.get(), name, time.monotonic(), attributes)
+    token = _PARENT.set(entry[0])
+    try:
+        yield
+    finally:
+        _PARENT.reset(token)
+        trace.close(entry, time.monotonic())
+
+
+def record(name: str, start: float, end: Optional[float] = None):
+    """Add an already-finished span (time.monotonic() bounds) under the current span."""
+    trace = _TRACE.get()
+    if trace is not None:
+        entry = trace.open(_PARENT.get(), name, start, None)
+        trace.close(entry, time.monotonic() if end is None else end)
+
+
+def since_start(name: str):
+    """Add a span from the start of the request until now, e.g. for body parsing."""
+    trace = _TRACE.get()
+    if trace is not None:
+        record(name, trace.start)
+
+
+def current() -> Optional[tuple]:
+    """Return (trace, parent span id) to hand to another thread, or None if not sampled."""
+    trace = _TRACE.get()
+    return None if trace is None else (trace, _PARENT.get())
+
+
+@contextmanager
+def collect(enabled: bool):
+    """
+    Collect spans on this thread into a detached trace, for adopt().
+
+    Yields:
+        _Trace or None: The detached trace; None unless enabled.
+    """
+    if not enabled:
+        yield None
+        return
+    trace = _Trace(keep_spans=_STATE["tracer"] is not None)
+    trace_token = _TRACE.set(trace)
+    parent_token = _PARENT.set(None)
+    try:
+        yield trace
+    finally:
+        _PARENT.reset(parent_token)
+        _TRACE.reset(trace_token)
+
+
+def adopt(target: tuple, collected: _Trace):
+    """Copy the spans of a collect() trace into target, a current() tuple."""
+    trace, parent = target
+    ids: dict = {}
+    for span_id, span_parent, name, start, end, attributes in collected.spans or ():
+        entry = trace.open(ids.get(span_parent, parent), name, start, attributes)
+        ids[span_id] = entry[0]
+        entry[4] = end
+    with trace._lock:  # pylint: disable=protected-access
+        for name, seconds in collected.totals.items():
+            trace.totals[name] = trace.totals.get(name, 0.0) + seconds
+
+
+def server_timing(trace: _Trace) -> str:
+    """Format the trace's per-name totals as a Server-Timing header value."""
+    with trace._lock:  # pylint: disable=protected-access
+        totals = list(trace.totals.items())
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in totals)
+
+
+def export(trace: _Trace):
+    """
+    Hand a finished trace's spans to the OpenTelemetry exporter, if one is set up.
+
+    Builds one SDK span per entry, so callers on the event loop run it in a thread.
+    """
+    tracer = _STATE["tracer"]
+    if tracer is None or not trace.spans:
+        return
+    from opentelemetry import trace as otel  # pylint: disable=import-outside-toplevel
+
+    created: dict = {}
+    # Parents start no later than their children, so a stable sort by start
+    # creates every parent before the spans that reference it.
+    entries = sorted(trace.spans, key=lambda e: e[3])
+    for span_id, parent, name, start, _, attributes in entries:
+        context = otel.set_span_in_context(created[parent]) if parent in created else None
+        created[span_id] = tracer.start_span(
+            name, context=context, start_time=trace.epoch_ns(start), attributes=attributes
+        )
+    for span_id, _, _, start, end, _ in entries:
+        created[span_id].end(end_time=trace.epoch_ns(start if end is None else end))
@@ -0,0 +1,17 @@
+"""Shared pytest setup: the service modules live flat in ../app, the tools in ../tools."""
+import os
+import sys
+
+import pytest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, "..", "app"))
+sys.path.insert(0, os.path.join(_HERE, "..", "tools"))
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory) -> str:
+    """Path of a tiny random BERT classifier with a fast tokenizer (see tools/bench.py)."""
+    import bench  # pylint: disable=import-outside-toplevel
+
+    return bench.build_tiny_model(str(tmp_path_factory.mktemp("tiny-model")))
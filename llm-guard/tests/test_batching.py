@@ -0,0 +1,94 @@
+"""Micro-batcher gathering, error hand-back and shutdown."""
+# pylint: disable=missing-function-docstring,too-few-public-methods
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import inference
+from batching import _MicroBatcher
+
+
+class _Recorder:
+    """Scores each text by its length and records the batches it was given."""
+
+    def __init__(self):
+        self.batches: list = []
+
+    def __call__(self, texts: list) -> list:
+        self.batches.append(list(texts))
+        return [float(len(t)) for t in texts]
+
+
+def test_concurrent_submissions_share_a_batch(monkeypatch):
+    # Four scans on the executor: the first to arrive waits for the others.
+    monkeypatch.setattr(inference, "running", lambda: 4)
+    score = _Recorder()
+    batcher = _MicroBatcher(score, max_batch_size=8, max_wait_ms=200)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.submit, ["x" * n, "y"]) for n in range(1, 5)]
+        results = [f.result(timeout=5) for f in futures]
+    batcher.close()
+    assert results == [[float(n), 1.0] for n in range(1, 5)]
+    # All four callers arrived within max_wait_ms and fit in one batch of 8.
+    assert len(score.batches) == 1
+    assert sorted(score.batches[0]) == sorted(["x", "xx", "xxx", "xxxx"] + ["y"] * 4)
+
+
+def test_lone_submission_is_scored_without_waiting(monkeypatch):
+    monkeypatch.setattr(inference, "running", lambda: 1)
+    score = _Recorder()
+    batcher = _MicroBatcher(score, max_batch_size=8, max_wait_ms=10_000)
+    started = time.monotonic()
+    assert batcher.submit(["a"]) == [1.0]
+    assert time.monotonic() - started < 5
+    batcher.close()
+    assert score.batches == [["a"]]
+
+
+def test_batch_is_flushed_at_max_batch_size():
+    score = _Recorder()
+    batcher = _MicroBatcher(score, max_batch_size=2, max_wait_ms=10_000)
+    assert batcher.submit(["a", "bb"]) == [1.0, 2.0]
+    batcher.close()
+    assert score.batches == [["a", "bb"]]
+
+
+def test_scoring_error_reaches_every_caller_and_worker_survives():
+    calls = []
+
+    def score(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return [0.5] * len(texts)
+
+    batcher = _MicroBatcher(score, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="boom"):
+        batcher.submit(["a"])
+    assert batcher.submit(["b"]) == [0.5]
+    batcher.close()
+
+
+def test_disabled_batcher_scores_on_the_caller_thread():
+    threads = []
+    batcher = _MicroBatcher(lambda t: threads.append(threading.current_thread()) or [0.0], 1, 5)
+    assert not batcher.enabled
+    assert batcher.submit(["a"]) == [0.0]
+    assert threads == [threading.current_thread()]
+
+
+def test_submissions_after_close_score_inline_and_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def score(texts):
+        # Both callers must be inside score_fn at once to pass the barrier.
+        barrier.wait()
+        return [1.0] * len(texts)
+
+    batcher = _MicroBatcher(score, max_batch_size=4, max_wait_ms=1)
+    batcher.close()
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(batcher.submit, [t]) for t in ("a", "b")]
+        assert [f.result(timeout=10) for f in futures] == [[1.0], [1.0]]
@@ -0,0 +1,90 @@
+"""Verdict cache eviction, expiry and accounting."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name
+import pytest
+
+import cache
+from cache import _VerdictCache
+
+
+def _verdict(n: int) -> tuple:
+    return True, {"Regex": float(n)}, None, None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    c = _VerdictCache(max_entries=2, max_bytes=0, ttl_seconds=0, eviction="lru")
+    c.put(b"a", _verdict(1))
+    c.put(b"b", _verdict(2))
+    assert c.get(b"a") == _verdict(1)
+    c.put(b"c", _verdict(3))
+    assert c.get(b"b") is None
+    assert c.get(b"a") == _verdict(1)
+    assert c.stats()["evictions"] == 1
+
+
+def test_fifo_evicts_the_oldest_entry_despite_hits():
+    c = _VerdictCache(max_entries=2, max_bytes=0, ttl_seconds=0, eviction="fifo")
+    c.put(b"a", _verdict(1))
+    c.put(b"b", _verdict(2))
+    c.get(b"a")
+    c.put(b"c", _verdict(3))
+    assert c.get(b"a") is None
+    assert c.get(b"b") == _verdict(2)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    c = _VerdictCache(max_entries=10, max_bytes=0, ttl_seconds=60, eviction="lru")
+    c.put(b"a", _verdict(1))
+    clock[0] += 59
+    assert c.get(b"a") == _verdict(1)
+    clock[0] += 1
+    assert c.get(b"a") is None
+    stats = c.stats()
+    assert (stats["entries"], stats["bytes"], stats["expirations"]) == (0, 0, 1)
+
+
+def test_byte_cap_evicts_until_under_budget():
+    one = cache._payload_size(_verdict(1))
+    c = _VerdictCache(max_entries=100, max_bytes=2 * one, ttl_seconds=0, eviction="lru")
+    for n in range(5):
+        c.put(bytes([n]), _verdict(n))
+    stats = c.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 2 * one
+    assert c.get(bytes([4])) == _verdict(4)
+
+
+def test_replacing_a_key_keeps_byte_accounting():
+    c = _VerdictCache(max_entries=10, max_bytes=0, ttl_seconds=0, eviction="lru")
+    c.put(b"a", _verdict(1))
+    blocked = (False, {"Regex": 1.0}, "matched", "[REDACTED]")
+    c.put(b"a", blocked)
+    assert c.stats()["entries"] == 1
+    assert c.stats()["bytes"] == cache._payload_size(blocked)
+
+
+def test_callers_cannot_mutate_cached_scores():
+    c = _VerdictCache(max_entries=10, max_bytes=0, ttl_seconds=0, eviction="lru")
+    scores = {"Regex": 0.0}
+    c.put(b"a", (True, scores, None, None))
+    scores["Regex"] = 1.0
+    c.get(b"a")[1]["Regex"] = 2.0
+    assert c.get(b"a")[1] == {"Regex": 0.0}
+
+
+def test_zero_entries_disables_the_cache():
+    c = _VerdictCache(max_entries=0, max_bytes=0, ttl_seconds=0, eviction="lru")
+    c.put(b"a", _verdict(1))
+    assert not c.enabled
+    assert c.get(b"a") is None
+
+
+def test_unknown_eviction_policy_is_rejected():
+    with pytest.raises(ValueError, match="eviction"):
+        _VerdictCache(max_entries=1, max_bytes=0, ttl_seconds=0, eviction="random")
@@ -0,0 +1,111 @@
+"""Admission accounting of the inference executor."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name,unused-argument
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import inference
+import metrics
+
+
+@pytest.fixture
+def single_worker(monkeypatch):
+    """Swap in a one-thread executor so a second scan has to queue."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setitem(inference._STATE, "executor", pool)
+    monkeypatch.setitem(inference._STATE, "queued", 0)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _queued_gauge() -> float:
+    return metrics.EXECUTOR_QUEUED._value.get()  # pylint: disable=protected-access
+
+
+def test_cancelled_queued_scan_releases_its_slot(single_worker):
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(inference.run(release.wait, 5))
+        while inference._STATE["queued"]:
+            await asyncio.sleep(0.001)
+        gauge_before = _queued_gauge()
+        queued = asyncio.ensure_future(inference.run(ran.append, "late"))
+        while not inference._STATE["queued"]:
+            await asyncio.sleep(0.001)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert inference._STATE["queued"] == 0
+        assert _queued_gauge() == gauge_before
+        release.set()
+        assert await blocker is True
+
+    asyncio.run(scenario())
+    single_worker.shutdown(wait=True)
+    # The worker reached the cancelled job only after it was abandoned.
+    assert not ran
+    assert inference._STATE["queued"] == 0
+
+
+def test_completed_scans_leave_nothing_queued(single_worker):
+    async def scenario():
+        return await asyncio.gather(*(inference.run(lambda i=i: i * 2) for i in range(5)))
+
+    assert asyncio.run(scenario()) == [0, 2, 4, 6, 8]
+    assert inference._STATE["queued"] == 0
+
+
+def test_gather_cancels_queued_siblings_when_one_fails(single_worker):
+    release = threading.Event()
+    ran = []
+
+    async def rejected():
+        await asyncio.sleep(0)
+        raise inference.Overloaded("queue_full")
+
+    async def scenario():
+        blocker = asyncio.ensure_future(inference.run(release.wait))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(inference.Overloaded):
+                await inference.gather(inference.run(ran.append, 1), rejected())
+            # The sibling was still queued behind the blocker; its slot is back.
+            assert inference._STATE["queued"] == 0
+        finally:
+            release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    single_worker.shutdown(wait=True)
+    assert not ran
+    assert inference._STATE["queued"] == 0
+
+
+@pytest.fixture
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(inference, "available_cpus", lambda: 8)
+    monkeypatch.setattr(inference.config, "INFERENCE_WORKERS", 0)
+    monkeypatch.setattr(inference.config, "TORCH_NUM_THREADS", 0)
+    monkeypatch.setitem(inference._STATE, "batchers", 0)
+
+
+def test_unbatched_passes_share_cpus_between_workers(eight_cpus):
+    assert inference.thread_budget()[:2] == (4, 2)
+
+
+def test_batched_passes_share_cpus_between_batchers(eight_cpus, monkeypatch):
+    monkeypatch.setitem(inference._STATE, "batchers", 1)
+    assert inference.thread_budget()[:2] == (4, 8)
+    monkeypatch.setitem(inference._STATE, "batchers", 2)
+    assert inference.intra_op_threads(batched=True) == 4
+    assert inference.intra_op_threads(batched=False) == 2
+
+
+def test_explicit_torch_threads_win(eight_cpus, monkeypatch):
+    monkeypatch.setattr(inference.config, "TORCH_NUM_THREADS", 3)
+    monkeypatch.setitem(inference._STATE, "batchers", 1)
+    assert inference.thread_budget()[1] == 3
@@ -0,0 +1,61 @@
+"""JSON log formatting and success-log sampling."""
+# pylint: disable=missing-function-docstring,protected-access
+import json
+import logging
+
+import pytest
+
+import logs
+
+
+def _record(level=logging.INFO, name="main", args=None, **extra) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, "scan done", args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_parse_rates():
+    assert logs._parse_rates(" /=0.1, *=1 ,") == {"/": 0.1, "*": 1.0}
+    assert logs._parse_rates("") == {}
+
+
+@pytest.mark.parametrize("spec", ["/", "=0.5", "/=2"])
+def test_parse_rates_rejects_bad_entries(spec):
+    with pytest.raises(ValueError, match="LOG_SAMPLE_RATES"):
+        logs._parse_rates(spec)
+
+
+def test_sampler_drops_successes_on_a_zero_rate_route():
+    sampler = logs._SuccessSampler({"/": 0.0})
+    assert not sampler.filter(_record(route="/", status=200, is_safe=True))
+    # Paths not listed fall back to "*", which defaults to keeping everything.
+    assert sampler.filter(_record(route="/scan/prompt", status=200))
+
+
+@pytest.mark.parametrize("record", [
+    _record(level=logging.WARNING, route="/"),
+    _record(route="/", is_safe=False),
+    _record(route="/", status=503),
+    _record(),  # not a per-request record
+])
+def test_sampler_always_keeps_blocks_errors_and_other_records(record):
+    assert logs._SuccessSampler({"/": 0.0, "*": 0.0}).filter(record)
+
+
+def test_sampler_reads_uvicorn_access_records():
+    sampler = logs._SuccessSampler({"/healthz": 0.0})
+    ok = _record(name="uvicorn.access", args=("1.2.3.4:5", "GET", "/healthz?x=1", "1.1", 200))
+    failed = _record(name="uvicorn.access", args=("1.2.3.4:5", "GET", "/healthz", "1.1", 500))
+    assert not sampler.filter(ok)
+    assert sampler.filter(failed)
+
+
+def test_json_formatter_includes_extras_and_stringifies_the_rest():
+    record = _record(route="/", scores={"Regex": 0.0}, path=object())
+    payload = json.loads(logs._JsonFormatter().format(record))
+    assert payload["msg"] == "scan done"
+    assert payload["route"] == "/"
+    assert payload["scores"] == {"Regex": 0.0}
+    assert isinstance(payload["path"], str)
+    assert "args" not in payload
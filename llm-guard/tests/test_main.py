@@ -0,0 +1,188 @@
+"""HTTP behaviour of the service endpoints, without loading any models."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name,unused-argument
+import asyncio
+import json
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+import inference
+import main
+import streaming
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the lifespan (model loading) never runs.
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    async def _shed(*_args):
+        raise inference.Overloaded("queue_full")
+
+    monkeypatch.setattr(inference, "run", _shed)
+
+
+@pytest.fixture
+def open_session(monkeypatch):
+    monkeypatch.setattr(streaming, "_SESSIONS", {"s1": object()})
+    return "s1"
+
+
+def test_fail_closed_overload_ends_the_stream(client, overloaded, open_session, monkeypatch):
+    monkeypatch.setattr(main.config, "OVERLOAD_POLICY", "fail_closed")
+    resp = client.post(f"/scan/stream/{open_session}", json={"chunk": "text"})
+    assert resp.status_code == 200
+    assert resp.json()["done"] is True
+    assert open_session not in streaming._SESSIONS
+
+
+def test_reject_overload_keeps_the_stream_for_a_retry(
+    client, overloaded, open_session, monkeypatch
+):
+    monkeypatch.setattr(main.config, "OVERLOAD_POLICY", "reject")
+    resp = client.post(f"/scan/stream/{open_session}", json={"chunk": "text"})
+    assert resp.status_code == 429
+    assert open_session in streaming._SESSIONS
+
+
+def test_stream_over_the_byte_cap_is_rejected(client, monkeypatch):
+    async def run(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(inference, "run", run)
+    monkeypatch.setattr(main.pipeline, "open_stream", lambda: [])
+    monkeypatch.setattr(streaming, "_SESSIONS", {})
+    monkeypatch.setattr(main.config, "STREAM_MAX_SESSION_BYTES", 4)
+    session_id = client.post("/scan/stream").json()["session_id"]
+    assert client.post(f"/scan/stream/{session_id}", json={"chunk": "abcd"}).status_code == 200
+    resp = client.post(f"/scan/stream/{session_id}", json={"chunk": "e"})
+    assert resp.status_code == 413
+    assert session_id not in streaming._SESSIONS
+
+
+@pytest.mark.parametrize("header, status", [
+    ("Bearer s3cret", None),
+    ("bearer s3cret", None),
+    ("s3cret", 401),
+    ("Bearer wrong", 401),
+    ("Basic s3cret", 401),
+    ("", 401),
+])
+def test_admin_token_must_be_sent_as_bearer(monkeypatch, header, status):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "s3cret")
+    request = Request({"type": "http", "headers": [(b"authorization", header.encode())]})
+    denied = main._admin_denied(request)
+    assert (denied and denied.status_code) == status
+
+
+def test_admin_endpoints_are_hidden_without_a_token(monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "")
+    request = Request({"type": "http", "headers": [(b"authorization", b"Bearer x")]})
+    assert main._admin_denied(request).status_code == 404
+
+
+def test_cache_stats_needs_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/cache/stats").status_code == 401
+    resp = client.get("/cache/stats", headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 200
+    assert "hits" in resp.json()
+
+
+def test_unknown_message_scan_mode_fails_startup(monkeypatch):
+    monkeypatch.setattr(main.config, "MESSAGE_SCAN_MODE", "per_turn")
+    async def start():
+        async with main.lifespan(main.app):
+            pytest.fail("started")
+
+    with pytest.raises(ValueError, match="MESSAGE_SCAN_MODE"):
+        asyncio.run(start())
+
+
+def test_extract_messages_keeps_request_positions():
+    req = main.LiteLLMRequest(texts=["first", "", "third"])
+    assert main._extract_messages(req) == [(0, "first"), (2, "third")]
+
+
+def test_extract_messages_takes_only_non_empty_user_messages():
+    req = main.LiteLLMRequest(structured_messages=[
+        {"role": "system", "content": "be nice"},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+        {"role": "user", "content": [
+            {"type": "text", "text": "look"},
+            {"type": "image_url", "image_url": {"url": "x"}},
+            {"type": "text", "text": "here"},
+        ]},
+        {"role": "user", "content": ""},
+    ])
+    assert main._extract_messages(req) == [(1, "hello"), (3, "look\nhere")]
+    assert main._extract_messages(main.LiteLLMRequest()) == []
+
+
+@pytest.fixture
+def scan_many(monkeypatch):
+    """Fake pipeline.scan_many_async blocking texts with "bad"; records each call's deadline."""
+    calls = []
+
+    async def fake(texts):
+        calls.append((list(texts), inference._DEADLINE.get()))
+        return [
+            (False, {"Fake": 1.0}, "bad", None) if "bad" in t else (True, {"Fake": 0.0}, None, t)
+            for t in texts
+        ]
+
+    monkeypatch.setattr(main.pipeline, "scan_many_async", fake)
+    return calls
+
+
+def test_scan_prompts_returns_results_in_order(client, scan_many):
+    resp = client.post("/scan/prompts", json={"prompts": ["ok", "bad", "fine"]})
+    assert resp.status_code == 200
+    assert [r["is_valid"] for r in resp.json()["results"]] == [True, False, True]
+    assert resp.json()["results"][1]["sanitized_prompt"] == "bad"
+    assert len(scan_many) == 1
+
+
+def test_scan_prompts_rejects_too_many_prompts(client, scan_many, monkeypatch):
+    monkeypatch.setattr(main.config, "SCAN_BATCH_MAX_PROMPTS", 2)
+    assert client.post("/scan/prompts", json={"prompts": ["a", "b", "c"]}).status_code == 413
+    assert not scan_many
+
+
+def test_scan_prompts_streams_ndjson_with_a_deadline_per_chunk(client, scan_many, monkeypatch):
+    monkeypatch.setattr(main.config, "SCAN_BATCH_CHUNK", 2)
+    resp = client.post(
+        "/scan/prompts",
+        json={"prompts": ["a", "bad", "c", "d", "e"], "stream": True},
+        headers={main.config.REQUEST_TIMEOUT_HEADER: "60000"},
+    )
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert [line["is_valid"] for line in lines] == [True, False, True, True, True]
+    assert [texts for texts, _ in scan_many] == [["a", "bad"], ["c", "d"], ["e"]]
+    # Each chunk was given its own budget, set when its scan started.
+    deadlines = [deadline for _, deadline in scan_many]
+    assert None not in deadlines
+    assert deadlines == sorted(deadlines) and len(set(deadlines)) == 3
+
+
+def test_ndjson_overload_under_reject_ends_with_an_error_line(client, monkeypatch):
+    monkeypatch.setattr(main.config, "OVERLOAD_POLICY", "reject")
+    monkeypatch.setattr(main.config, "SCAN_BATCH_CHUNK", 1)
+
+    async def fake(texts):
+        if texts == ["b"]:
+            raise inference.Overloaded("deadline")
+        return [(True, {}, None, None) for _ in texts]
+
+    monkeypatch.setattr(main.pipeline, "scan_many_async", fake)
+    resp = client.post("/scan/prompts", json={"prompts": ["a", "b", "c"], "stream": True})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1]
+    assert "error" in lines[1]
@@ -0,0 +1,63 @@
+"""Prometheus metrics exposed on /metrics."""
+# pylint: disable=missing-function-docstring,redefined-outer-name
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+import main
+import metrics
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the lifespan (model loading) never runs.
+    return TestClient(main.app)
+
+
+def _samples(text: str) -> dict:
+    """Map (sample name, sorted labels) to value for a /metrics payload."""
+    return {
+        (s.name, tuple(sorted(s.labels.items()))): s.value
+        for family in text_string_to_metric_families(text)
+        for s in family.samples
+    }
+
+
+def test_request_latency_is_labelled_by_route_template(client):
+    client.get("/healthz")
+    client.delete("/scan/stream/no-such-session")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    samples = _samples(resp.text)
+    count = "llm_guard_request_duration_seconds_count"
+    assert samples[(count, (("method", "GET"), ("route", "/healthz")))] >= 1
+    # The route template, not the session id, so label cardinality stays bounded.
+    assert samples[(count, (("method", "DELETE"), ("route", "/scan/stream/{session_id}")))] >= 1
+
+
+def test_verdict_cache_counters_are_read_at_scrape_time(client, monkeypatch):
+    stats = {"hits": 3, "misses": 5, "evictions": 0, "expirations": 1, "entries": 7, "bytes": 900}
+    cache = SimpleNamespace(stats=lambda: stats)
+    monkeypatch.setattr(main.pipeline, "_PIPELINE", SimpleNamespace(cache=cache))
+    samples = _samples(client.get("/metrics").text)
+    assert samples[("llm_guard_verdict_cache_hits_total", ())] == 3
+    assert samples[("llm_guard_verdict_cache_entries", ())] == 7
+    stats["hits"] = 4
+    assert _samples(client.get("/metrics").text)[("llm_guard_verdict_cache_hits_total", ())] == 4
+
+
+def test_scanner_results_count_safe_and_blocked_texts():
+    def value(result):
+        return REGISTRY.get_sample_value(
+            "llm_guard_scanner_results_total", {"scanner": "MetricsTest", "result": result}
+        ) or 0.0
+
+    safe, blocked = value("safe"), value("blocked")
+    metrics.scanner_result("MetricsTest", True)
+    metrics.scanner_result("MetricsTest", False)
+    metrics.scanner_result("MetricsTest", False)
+    assert (value("safe") - safe, value("blocked") - blocked) == (1, 2)
@@ -0,0 +1,43 @@
+"""Normalized text views."""
+# pylint: disable=missing-function-docstring,protected-access
+import pytest
+
+from normalization import VIEWS, TextViews
+
+
+def test_raw_is_returned_untouched():
+    text = "Ｉｇｎｏｒｅ\u200b previous"
+    assert TextViews(text).get("raw") is text
+
+
+def test_nfkc_folds_compatibility_variants_but_not_lookalikes():
+    assert TextViews("ｉｇｎｏｒｅ 𝐚𝐥𝐥").get("nfkc") == "ignore all"
+    # Cyrillic "а" is a different letter, not a compatibility variant.
+    assert TextViews("ignore аll").get("nfkc") == "ignore аll"
+
+
+def test_stripped_removes_invisible_characters():
+    assert TextViews("ig\u200bno\u00adre\u2060 all\ufeff").get("stripped") == "ignore all"
+
+
+def test_casefold_builds_on_stripped():
+    assert TextViews("ＩＧ\u200bNORE Straße").get("casefold") == "ignore strasse"
+    assert TextViews("IGNORE ALL").get("casefold") == "ignore all"
+
+
+def test_views_are_computed_once_and_only_on_demand():
+    views = TextViews("ｉｇｎｏｒｅ")
+    assert views._nfkc is None
+    first = views.get("casefold")
+    assert views.get("casefold") is first
+    assert views._nfkc == "ignore"
+
+
+@pytest.mark.parametrize("view", VIEWS)
+def test_ascii_views_take_the_fast_path(view):
+    assert TextViews("Plain ASCII").get(view) in ("Plain ASCII", "plain ascii")
+
+
+def test_unknown_view_is_rejected():
+    with pytest.raises(ValueError, match="Unknown text view"):
+        TextViews("x").get("upper")
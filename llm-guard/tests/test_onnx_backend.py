@@ -0,0 +1,44 @@
+"""ONNX backend parity with torch and its exported-graph cache key."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+import onnx_backend  # noqa: E402  pylint: disable=wrong-import-position
+import onnx_parity  # noqa: E402  pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def hf_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HF_HOME", str(tmp_path / "hf"))
+    return tmp_path / "hf"
+
+
+def test_onnx_scores_match_torch(tiny_model, hf_home):
+    texts = onnx_parity.load_corpus(onnx_parity._DEFAULT_CORPUS)
+    reference = onnx_parity.score(tiny_model, "torch", texts)
+    candidate = onnx_parity.score(tiny_model, "onnx", texts)
+    assert max(abs(r - c) for r, c in zip(reference, candidate)) < 1e-4
+    # Exported once, with the ORT-optimized graph saved beside it.
+    (cache,) = (hf_home / "onnx").iterdir()
+    (revision,) = cache.iterdir()
+    assert revision.name.startswith("local-")
+    assert {"model.onnx", f"model.ort-{onnx_backend.ort.__version__}.onnx"} <= {
+        p.name for p in revision.iterdir()
+    }
+
+
+def test_local_model_cache_key_follows_its_files(tiny_model, tmp_path):
+    model = str(tmp_path / "model")
+    shutil.copytree(tiny_model, model)
+    config = onnx_backend.AutoConfig.from_pretrained(model)
+    before = onnx_backend._revision(model, config)
+    assert onnx_backend._revision(model, config) == before
+    weights = os.path.join(model, "model.safetensors")
+    st = os.stat(weights)
+    os.utime(weights, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert onnx_backend._revision(model, config) != before
@@ -0,0 +1,215 @@
+"""Config validation and mode semantics of the scanner pipeline."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name
+import asyncio
+
+import pytest
+
+import pipeline
+from cache import _VerdictCache
+from scanner_types import ScanResult
+
+
+def _build(yaml_text: str):
+    return pipeline._build_from_config(yaml_text, "test.yml")
+
+
+def test_redact_on_normalized_view_is_rejected():
+    with pytest.raises(ValueError, match="redact requires view 'raw'"):
+        _build(
+            """
+input_scanners:
+  - type: Regex
+    view: casefold
+    params: {patterns: ["secret"], redact: true}
+"""
+        )
+
+
+def test_redact_on_raw_view_is_accepted():
+    stages, _ = _build(
+        """
+input_scanners:
+  - type: Regex
+    params: {patterns: ["secret"], redact: true}
+  - type: InvisibleText
+    view: raw
+"""
+    )
+    assert [s.view for s in stages] == ["raw", "raw"]
+
+
+class _FakeScanner:
+    """Scores texts from a fixed table and records what it was asked to scan."""
+
+    def __init__(self, name: str, model_backed: bool, cost: float, table: dict):
+        self.name = name
+        self.model_backed = model_backed
+        self.cost = cost
+        self._table = table
+        self.seen: list = []
+
+    def scan(self, text: str) -> ScanResult:
+        self.seen.append(text)
+        is_safe, conclusive = self._table.get(text, (True, False))
+        return ScanResult(
+            scanner=self.name, is_safe=is_safe, score=0.0 if is_safe else 1.0,
+            reason=None if is_safe else f"{self.name} blocked", conclusive=conclusive,
+        )
+
+    def scan_batch(self, texts: list) -> list:
+        return [self.scan(t) for t in texts]
+
+
+def _pipeline(scanners: list, mode: str = "sequential") -> pipeline._Pipeline:
+    p = pipeline._Pipeline(cache=_VerdictCache(0, 0, 0, "lru"))
+    p._stages = [pipeline._Stage(s.name, s, s.cost) for s in scanners]
+    p._fail_fast = mode == "fail_fast"
+    p._concurrent = mode == "concurrent"
+    return p
+
+
+def _scan_one(p, text):
+    return p.scan(text)
+
+
+def _scan_batched(p, text):
+    return p.scan_many(["filler", text])[1]
+
+
+def _scan_concurrent(p, text):
+    p._concurrent = True
+    return asyncio.run(p.scan_many_async([text, "filler"]))[0]
+
+
+_RUNNERS = pytest.mark.parametrize("scan", [_scan_one, _scan_batched, _scan_concurrent])
+
+
+def _similarity_then_model_then_regex():
+    similarity = _FakeScanner("EmbeddingSimilarity", True, 20.0,
+                              {"known good, secret": (True, True), "attack": (False, True)})
+    model = _FakeScanner("PromptInjection", True, 100.0, {})
+    regex = _FakeScanner("Regex", False, 2.0, {"known good, secret": (False, False)})
+    return similarity, model, regex
+
+
+@_RUNNERS
+def test_conclusive_allow_skips_only_model_backed_scanners(scan):
+    similarity, model, regex = _similarity_then_model_then_regex()
+    is_safe, scores, reason, _ = scan(_pipeline([similarity, model, regex]), "known good, secret")
+    assert not is_safe
+    assert reason == "Regex blocked"
+    assert scores == {"EmbeddingSimilarity": 0.0, "PromptInjection": None, "Regex": 1.0}
+    if scan is not _scan_concurrent:
+        assert "known good, secret" not in model.seen
+
+
+@_RUNNERS
+def test_conclusive_block_skips_every_later_scanner(scan):
+    similarity, model, regex = _similarity_then_model_then_regex()
+    is_safe, scores, reason, _ = scan(_pipeline([similarity, model, regex]), "attack")
+    assert not is_safe
+    assert reason == "EmbeddingSimilarity blocked"
+    assert scores == {"EmbeddingSimilarity": 1.0, "PromptInjection": None, "Regex": None}
+
+
+def test_fail_fast_runs_cheapest_first_and_stops_at_first_block():
+    model = _FakeScanner("PromptInjection", True, 100.0, {"x": (False, False)})
+    regex = _FakeScanner("Regex", False, 2.0, {"x": (False, False)})
+    invisible = _FakeScanner("InvisibleText", False, 1.0, {})
+    is_safe, scores, reason, _ = _pipeline([model, regex, invisible], "fail_fast").scan("x")
+    assert (is_safe, reason) == (False, "Regex blocked")
+    assert scores == {"InvisibleText": 0.0, "Regex": 1.0, "PromptInjection": None}
+    assert not model.seen
+
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent"])
+def test_blocked_reason_follows_config_order(mode):
+    model = _FakeScanner("PromptInjection", True, 100.0, {"x": (False, False)})
+    regex = _FakeScanner("Regex", False, 2.0, {"x": (False, False)})
+    p = _pipeline([model, regex], mode)
+    is_safe, scores, reason, _ = asyncio.run(p.scan_async("x"))
+    assert (is_safe, reason) == (False, "PromptInjection blocked")
+    assert scores == {"PromptInjection": 1.0, "Regex": 1.0}
+
+
+@pytest.fixture
+def config_file(tmp_path, tiny_model, monkeypatch):
+    """Write a PromptInjection config with the given extra params; returns the writer."""
+    path = tmp_path / "scanners.yml"
+    monkeypatch.setattr(pipeline.config, "CONFIG_FILE", str(path))
+
+    def write(**params):
+        params = {"model": tiny_model, "batch_max_size": 1, "warmup_lengths": [], **params}
+        body = ", ".join(f"{k}: {v!r}" if isinstance(v, str) else f"{k}: {v}"
+                         for k, v in params.items())
+        path.write_text(f"input_scanners:\n  - type: PromptInjection\n    params: {{{body}}}\n")
+
+    return write
+
+
+@pytest.fixture
+def loaded_pipeline(config_file, monkeypatch):
+    config_file(threshold=0.9)
+    p = pipeline._Pipeline(cache=_VerdictCache(16, 0, 0, "lru"))
+    p.load()
+    monkeypatch.setattr(pipeline, "_PIPELINE", p)
+    yield p
+    pipeline._PIPELINE.close()
+
+
+def _model(p: pipeline._Pipeline):
+    return p._stages[0].scanner._pipe
+
+
+def test_reload_reuses_models_whose_model_params_are_unchanged(config_file, loaded_pipeline):
+    config_file(threshold=0.5)
+    pipeline.reload()
+    assert pipeline._PIPELINE is not loaded_pipeline
+    assert pipeline._PIPELINE._stages[0].scanner._threshold == 0.5
+    assert _model(pipeline._PIPELINE) is _model(loaded_pipeline)
+
+
+def test_reload_loads_a_new_model_when_model_params_change(config_file, loaded_pipeline):
+    config_file(threshold=0.9, model_max_length=128)
+    pipeline.reload()
+    assert _model(pipeline._PIPELINE) is not _model(loaded_pipeline)
+
+
+def test_failed_reload_keeps_the_old_pipeline(config_file, loaded_pipeline):
+    loaded_pipeline.scan("hello")
+    config_file(threshold=0.9, backend="tensorflow")
+    with pytest.raises(ValueError, match="Unknown backend"):
+        pipeline.reload()
+    assert pipeline._PIPELINE is loaded_pipeline
+    # Its cached verdicts survive too.
+    assert loaded_pipeline.cache.stats()["entries"] == 1
+
+
+def test_reload_clears_the_verdict_cache_at_the_swap(config_file, loaded_pipeline):
+    loaded_pipeline.scan("hello")
+    config_file(threshold=0.5)
+    pipeline.reload()
+    assert pipeline._PIPELINE.cache is loaded_pipeline.cache
+    assert loaded_pipeline.cache.stats()["entries"] == 0
+
+
+def test_merge_verdicts_blocks_on_the_first_unsafe_message():
+    verdicts = [
+        (True, {"Regex": 0.0, "PromptInjection": 0.2}, None, None),
+        (False, {"Regex": 1.0, "PromptInjection": None}, "Regex blocked", None),
+        (False, {"Regex": 0.0, "PromptInjection": 0.9}, "PromptInjection blocked", None),
+    ]
+    is_safe, scores, reason, index = pipeline.merge_verdicts(verdicts)
+    assert (is_safe, reason, index) == (False, "Regex blocked", 1)
+    # Per-scanner max across messages; a scanner that did not run is ignored.
+    assert scores == {"Regex": 1.0, "PromptInjection": 0.9}
+
+
+def test_merge_verdicts_of_safe_messages():
+    verdicts = [
+        (True, {"Regex": 0.0, "PromptInjection": None}, None, None),
+        (True, {"Regex": 0.0, "PromptInjection": None}, None, None),
+    ]
+    assert pipeline.merge_verdicts(verdicts) == (
+        True, {"Regex": 0.0, "PromptInjection": None}, None, None
+    )
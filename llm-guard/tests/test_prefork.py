@@ -0,0 +1,64 @@
+"""Worker readiness flags and the master's restart loop."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name
+import multiprocessing
+import socket
+
+import pytest
+
+import prefork
+
+
+@pytest.fixture
+def flags(monkeypatch):
+    ready = multiprocessing.RawArray("b", 3)
+    monkeypatch.setitem(prefork._STATE, "ready", ready)
+    monkeypatch.setitem(prefork._STATE, "index", None)
+    return ready
+
+
+def test_readiness_before_serve_reports_no_workers():
+    assert not prefork.active()
+    assert prefork.readiness() == (0, 0)
+
+
+def test_mark_ready_sets_only_this_workers_flag(flags, monkeypatch):
+    prefork.mark_ready()
+    assert prefork.readiness() == (0, 3)
+    monkeypatch.setitem(prefork._STATE, "index", 1)
+    prefork.mark_ready()
+    assert list(flags) == [0, 1, 0]
+    assert prefork.readiness() == (1, 3)
+    prefork.mark_ready(False)
+    assert prefork.readiness() == (0, 3)
+
+
+def test_master_restarts_an_exited_worker_in_its_slot(monkeypatch):
+    spawned, dead = [], []
+    exits = iter([(1001, 256)])
+
+    def spawn(_app, _sock, index):
+        spawned.append(index)
+        # The first two workers come up; the replacement is still loading.
+        prefork._STATE["ready"][index] = int(len(spawned) <= 2)
+        return 1000 + len(spawned)
+
+    def wait():
+        try:
+            return next(exits)
+        except StopIteration:
+            raise ChildProcessError from None
+
+    monkeypatch.setitem(prefork._STATE, "ready", None)
+    monkeypatch.setattr(prefork, "_spawn", spawn)
+    monkeypatch.setattr(prefork, "_bind", lambda host, port: socket.socket())
+    monkeypatch.setattr(prefork.signal, "signal", lambda *args: None)
+    monkeypatch.setattr(prefork.gc, "freeze", lambda: None)
+    monkeypatch.setattr(prefork.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(prefork.os, "wait", wait)
+    monkeypatch.setattr(prefork.metrics, "mark_process_dead", dead.append)
+    with pytest.raises(SystemExit):
+        prefork.serve(object(), "127.0.0.1", 0, 2, preload=lambda: None)
+    # Worker 0 (pid 1001) exited: its flag was cleared and it was respawned.
+    assert spawned == [0, 1, 0]
+    assert dead == [1001]
+    assert list(prefork._STATE["ready"]) == [0, 1]
@@ -0,0 +1,81 @@
+"""On-demand profiling: the /admin/profile archive and forward-pass capture."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import profiler
+
+_AUTH = {"Authorization": "Bearer s3cret"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(profiler.config, "PROFILE_SAMPLE_HZ", 200.0)
+    # Not entered as a context manager, so the lifespan (model loading) never runs.
+    return TestClient(main.app)
+
+
+class _FakeProfiler:
+    """Stands in for torch.profiler.profile: writes a fixed Chrome trace."""
+
+    def __init__(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def export_chrome_trace(self, path: str):
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write('{"traceEvents": []}')
+
+
+def test_profile_returns_a_zip_of_cpu_stacks(client):
+    resp = client.post("/admin/profile?seconds=0.2&forward_passes=0", headers=_AUTH)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    assert f"llm-guard-profile-{os.getpid()}-" in resp.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert sorted(zf.namelist()) == ["cpu.collapsed", "profile.json"]
+        summary = json.loads(zf.read("profile.json"))
+        stacks = zf.read("cpu.collapsed").decode().splitlines()
+    assert summary["pid"] == os.getpid()
+    assert summary["sampling_rounds"] > 0
+    assert summary["forward_passes"] == []
+    # "thread;outer;...;inner count", rooted at the thread name.
+    assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    assert any(line.startswith("MainThread;") for line in stacks)
+
+
+def test_profile_needs_the_admin_token(client):
+    assert client.post("/admin/profile?seconds=0.1").status_code == 401
+
+
+def test_concurrent_capture_is_rejected(client):
+    with profiler._CAPTURE_LOCK:
+        resp = client.post("/admin/profile?seconds=0.1", headers=_AUTH)
+    assert resp.status_code == 409
+
+
+def test_forward_passes_are_traced_up_to_the_limit(monkeypatch):
+    monkeypatch.setattr(profiler, "_start_torch_profiler", _FakeProfiler)
+    active = profiler._ForwardCapture(1)
+    monkeypatch.setitem(profiler._STATE, "forward", active)
+    for _ in range(2):
+        with profiler.forward("org/model"):
+            pass
+    assert active.traces == [("org/model", '{"traceEvents": []}')]
+    assert active.running == 0
+    assert not profiler._PROFILER_LOCK.locked()
+
+
+def test_forward_is_a_no_op_between_captures(monkeypatch):
+    monkeypatch.setattr(profiler, "_start_torch_profiler", lambda: pytest.fail("profiled"))
+    with profiler.forward("org/model"):
+        pass
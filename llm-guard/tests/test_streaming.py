@@ -0,0 +1,73 @@
+"""Stream session lifecycle."""
+# pylint: disable=missing-function-docstring,protected-access
+import time
+
+import pytest
+
+import pipeline
+import streaming
+from scanner_types import ScanResult
+
+
+class _FakeStream:
+    """Blocks once the text streamed so far contains "bad"."""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, chunk: str) -> ScanResult:
+        self.text += chunk
+        is_safe = "bad" not in self.text
+        return ScanResult(scanner="Fake", is_safe=is_safe, score=0.0 if is_safe else 1.0,
+                          reason=None if is_safe else "bad")
+
+    def finish(self) -> ScanResult:
+        return self.feed("")
+
+
+@pytest.fixture(autouse=True)
+def fake_pipeline(monkeypatch):
+    monkeypatch.setattr(pipeline, "open_stream", lambda: [("Fake", _FakeStream(), "raw")])
+    monkeypatch.setattr(streaming, "_SESSIONS", {})
+
+
+def test_block_ends_the_session():
+    session_id = streaming.open_session()
+    assert streaming.feed(session_id, "all go", False) == (True, {"Fake": 0.0}, None, False)
+    assert streaming.feed(session_id, "od, then ba", False)[3] is False
+    assert streaming.feed(session_id, "d", False) == (False, {"Fake": 1.0}, "bad", True)
+    with pytest.raises(KeyError):
+        streaming.feed(session_id, "more", False)
+
+
+def test_final_chunk_ends_the_session():
+    session_id = streaming.open_session()
+    assert streaming.feed(session_id, "fine", True)[3] is True
+    assert not streaming.close(session_id)
+
+
+def test_idle_session_expires_on_feed(monkeypatch):
+    monkeypatch.setattr(streaming.config, "STREAM_SESSION_TTL_SECONDS", 10.0)
+    session_id = streaming.open_session()
+    streaming._SESSIONS[session_id].last_used = time.monotonic() - 11
+    with pytest.raises(KeyError):
+        streaming.feed(session_id, "late", False)
+    assert session_id not in streaming._SESSIONS
+
+
+def test_session_limit(monkeypatch):
+    monkeypatch.setattr(streaming.config, "STREAM_MAX_SESSIONS", 1)
+    first = streaming.open_session()
+    assert streaming.open_session() is None
+    assert streaming.close(first)
+    assert streaming.open_session() is not None
+
+
+def test_session_over_the_byte_cap_is_closed(monkeypatch):
+    monkeypatch.setattr(streaming.config, "STREAM_MAX_SESSION_BYTES", 8)
+    session_id = streaming.open_session()
+    # Counted in UTF-8 bytes: "é" is two.
+    assert streaming.feed(session_id, "abcdé", False)[0] is True
+    with pytest.raises(streaming.SessionTooLarge):
+        streaming.feed(session_id, "xyz", False)
+    assert session_id not in streaming._SESSIONS
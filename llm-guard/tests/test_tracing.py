@@ -0,0 +1,105 @@
+"""Request tracing: Server-Timing totals, spans adopted across threads and export."""
+# pylint: disable=missing-function-docstring,protected-access,redefined-outer-name,unused-argument
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import tracing
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the lifespan (model loading) never runs.
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def fake_scan(monkeypatch):
+    """Fake pipeline.scan_async that times a "fake" span and records the loop's thread."""
+    threads = []
+
+    async def scan_async(text):
+        threads.append(threading.current_thread())
+        with tracing.span("fake"):
+            return True, {"Fake": 0.0}, None, text
+
+    monkeypatch.setattr(main.pipeline, "scan_async", scan_async)
+    return threads
+
+
+def _timing(header: str) -> dict:
+    """Parse a Server-Timing header into {name: milliseconds}."""
+    out = {}
+    for part in header.split(", "):
+        name, dur = part.split(";dur=")
+        out[name] = float(dur)
+    return out
+
+
+def test_sampled_request_reports_server_timing(client, fake_scan, monkeypatch):
+    monkeypatch.setattr(tracing.config, "TRACE_SAMPLE_RATE", 1.0)
+    resp = client.post("/scan/prompt", json={"prompt": "hello"})
+    assert resp.status_code == 200
+    timing = _timing(resp.headers["server-timing"])
+    assert set(timing) == {"parse", "fake"}
+    assert all(ms >= 0 for ms in timing.values())
+
+
+def test_unsampled_request_has_no_server_timing(client, fake_scan, monkeypatch):
+    monkeypatch.setattr(tracing.config, "TRACE_SAMPLE_RATE", 0.0)
+    resp = client.post("/scan/prompt", json={"prompt": "hello"})
+    assert resp.status_code == 200
+    assert "server-timing" not in resp.headers
+
+
+def test_export_runs_off_the_event_loop(client, fake_scan, monkeypatch):
+    monkeypatch.setattr(tracing.config, "TRACE_SAMPLE_RATE", 1.0)
+    # A tracer makes traces keep their spans for export.
+    monkeypatch.setitem(tracing._STATE, "tracer", object())
+    exported = []
+    monkeypatch.setattr(
+        tracing, "export",
+        lambda trace: exported.append((threading.current_thread(), [e[2] for e in trace.spans])),
+    )
+    client.post("/scan/prompt", json={"prompt": "hello"})
+    assert len(exported) == 1
+    thread, names = exported[0]
+    assert thread is not fake_scan[0]
+    assert names[0] == "request" and "fake" in names
+
+
+def test_adopt_grafts_collected_spans_under_the_callers_span(monkeypatch):
+    monkeypatch.setitem(tracing._STATE, "tracer", object())
+    trace = tracing._Trace(keep_spans=True)
+    with tracing.request(trace, "request"), tracing.span("scan"):
+        target = tracing.current()
+    collected = []
+
+    def worker():
+        # As the micro-batcher does: collect one pass's spans on its own thread.
+        with tracing.collect(True) as spans, tracing.span("batch"), tracing.span("forward"):
+            pass
+        collected.append(spans)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    tracing.adopt(target, collected[0])
+    tracing.adopt(target, collected[0])
+    by_id = {entry[0]: entry for entry in trace.spans}
+    names = {entry[0]: entry[2] for entry in trace.spans}
+    batches = [entry for entry in trace.spans if entry[2] == "batch"]
+    forwards = [entry for entry in trace.spans if entry[2] == "forward"]
+    assert len(batches) == len(forwards) == 2
+    # Each copy hangs off the caller's "scan" span and keeps its own nesting.
+    assert all(names[b[1]] == "scan" for b in batches)
+    assert sorted(by_id[f[1]][0] for f in forwards) == sorted(b[0] for b in batches)
+    assert trace.totals["batch"] == pytest.approx(2 * collected[0].totals["batch"])
+
+
+def test_collect_is_a_no_op_unless_enabled():
+    with tracing.collect(False) as spans:
+        assert spans is None
+        assert tracing.current() is None
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Offline scanner micro-benchmarks.
+
+Drives PromptInjectionScanner, RegexScanner, InvisibleTextScanner and
+_Pipeline.scan over seeded synthetic corpora that vary in length, sentence
+count, Unicode mix and pattern count. Runs with no network: by default the
+PromptInjection cases use a tiny randomly initialised BERT generated into a
+temporary directory, so model numbers measure the scanner machinery
+(tokenization, batching, windowing) rather than a real model's FLOPs. Pass
+--model with a local path or cached Hub ID to benchmark a real model.
+
+Results are written as JSON (ops/s, p50/p99 latency, peak RSS per case) so
+runs from two commits can be compared with --compare.
+
+Usage:
+    python llm-guard/tools/bench.py [--output results.json] [--filter REGEX]
+                                    [--model PATH] [--long] [--min-time 1.0]
+    python llm-guard/tools/bench.py --compare base.json head.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import re
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+_SEED = 1234
+_WORDS = [
+    "the", "model", "system", "prompt", "user", "please", "summarise", "report", "ignore",
+    "previous", "instructions", "capital", "france", "weather", "function", "python", "data",
+    "request", "token", "window", "guard", "scanner", "document", "quarterly", "meeting",
+]
+_UNICODE_MIXES = {
+    "ascii": string.ascii_letters + string.digits + "     .,",
+    "latin": string.ascii_letters + "éèêàçüöäßñøå     .,",
+    "cjk": "".join(chr(c) for c in range(0x4E00, 0x4E80)) + "。、 ",
+    # Clean mixed script with a sprinkling of zero-width characters.
+    "invisible": string.ascii_letters + "éж     .," + "\u200b\u200d\u2060",
+}
+
+
+def _rng() -> random.Random:
+    """Return a freshly seeded RNG so every corpus is reproducible."""
+    return random.Random(_SEED)
+
+
+def prose(n_chars: int, sentence_words: int = 12) -> str:
+    """Return roughly n_chars of word-salad prose, split into sentences."""
+    rng = _rng()
+    out, size = [], 0
+    while size < n_chars:
+        words = [rng.choice(_WORDS) for _ in range(sentence_words)]
+        sentence = " ".join(words).capitalize() + rng.choice(".!?") + " "
+        out.append(sentence)
+        size += len(sentence)
+    return "".join(out)[:n_chars]
+
+
+def unicode_text(n_chars: int, mix: str) -> str:
+    """Return n_chars drawn from one of the _UNICODE_MIXES alphabets."""
+    rng = _rng()
+    alphabet = _UNICODE_MIXES[mix]
+    return "".join(rng.choice(alphabet) for _ in range(n_chars))
+
+
+def secret_patterns(count: int) -> list:
+    """Return count distinct credential-style regex patterns."""
+    rng = _rng()
+    patterns = []
+    for i in range(count):
+        prefix = "".join(rng.choice(string.ascii_lowercase) for _ in range(3))
+        patterns.append(rf"{prefix}{i}_[A-Za-z0-9]{{{16 + i % 16}}}")
+    return patterns
+
+
+def build_tiny_model(path: str) -> str:
+    """Generate a tiny random BERT sequence classifier with a fast tokenizer at path."""
+    # Imported here so --compare runs without transformers installed.
+    from transformers import (  # pylint: disable=import-outside-toplevel
+        BertConfig,
+        BertForSequenceClassification,
+        BertTokenizerFast,
+    )
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab += list(string.ascii_lowercase + string.digits + string.punctuation) + _WORDS
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(vocab))
+    tokenizer = BertTokenizerFast(vocab_file, do_lower_case=True)
+    # BertConfig takes its fields as **kwargs, which pylint cannot see.
+    cfg = BertConfig(  # pylint: disable=unexpected-keyword-arg
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=512,
+        id2label={0: "SAFE", 1: "INJECTION"},
+        label2id={"SAFE": 0, "INJECTION": 1},
+    )
+    BertForSequenceClassification(cfg).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+def measure(fn, arg, min_time: float, min_iters: int = 5) -> dict:
+    """Call fn(arg) repeatedly for at least min_time seconds; return latency stats."""
+    fn(arg)  # warm-up, not recorded
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_iters or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "iterations": len(samples),
+        "ops_per_s": len(samples) / total if total else float("inf"),
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        # ru_maxrss is the process-wide peak so far (KiB on Linux), so it is
+        # monotonic across cases; run a single case with --filter to isolate it.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _case_id(name: str, params: dict) -> str:
+    """Return the id --filter matches, e.g. ``regex[engine=re,patterns=10,chars=1000]``."""
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+def _cases(model, long_inputs: bool, wanted):
+    """Yield (name, params, fn, arg) for every case whose id wanted() accepts.
+
+    Scanners, models and the pipeline are only built for groups with at
+    least one wanted case, so a --filter run loads nothing it does not time.
+    model is called for the model path the first time a model case needs it.
+    """
+    # pylint: disable=import-outside-toplevel
+    import config
+    import pipeline
+    from scanner_types import InvisibleTextScanner, PromptInjectionScanner, RegexScanner
+
+    def select(name: str, grid: list) -> list:
+        return [params for params in grid if wanted(_case_id(name, params))]
+
+    selected = select("invisible", [
+        {"mix": mix, "chars": n} for mix in _UNICODE_MIXES for n in (1_000, 100_000, 1_000_000)
+    ])
+    if selected:
+        invisible = InvisibleTextScanner()
+        for params in selected:
+            yield "invisible", params, invisible.scan, unicode_text(params["chars"], params["mix"])
+
+    for count in (10, 50, 150):
+        for engine in ("re", "combined"):
+            selected = select("regex", [
+                {"engine": engine, "patterns": count, "chars": n} for n in (1_000, 100_000)
+            ])
+            if not selected:
+                continue
+            scanner = RegexScanner(patterns=secret_patterns(count), engine=engine)
+            for params in selected:
+                yield "regex", params, scanner.scan, prose(params["chars"])
+
+    lengths = (200, 2_000, 20_000) + ((200_000, 2_000_000) if long_inputs else ())
+    for match_type in ("full", "sentence", "window"):
+        selected = select("prompt_injection", [
+            {"match_type": match_type, "chars": n} for n in lengths
+            if not (match_type == "sentence" and n > 20_000)
+        ])
+        if not selected:
+            continue
+        scanner = PromptInjectionScanner(model=model(), match_type=match_type, batch_max_size=16)
+        scanner.load()
+        for params in selected:
+            yield "prompt_injection", params, scanner.scan, prose(params["chars"])
+
+    selected = select("pipeline", [
+        {"chars": 200, "cache": False},
+        {"chars": 2_000, "cache": False},
+        {"chars": 20_000, "cache": False},
+        {"chars": 2_000, "cache": True},
+    ])
+    if not selected:
+        return
+    with tempfile.NamedTemporaryFile("w", suffix=".yml", delete=False) as fh:
+        fh.write(
+            "input_scanners:\n"
+            "  - type: InvisibleText\n"
+            "  - type: Regex\n"
+            f"    params: {{patterns: {json.dumps(secret_patterns(150))}}}\n"
+            "  - type: PromptInjection\n"
+            f"    params: {{model: {json.dumps(model())}}}\n"
+        )
+    config.CONFIG_FILE = fh.name
+    pipe = pipeline._Pipeline()  # pylint: disable=protected-access
+    pipe.load()
+    uncached = pipe._scan  # pylint: disable=protected-access
+    for params in selected:
+        yield "pipeline", params, pipe.scan if params["cache"] else uncached, prose(params["chars"])
+    os.unlink(fh.name)
+
+
+def _git_commit() -> str:
+    """Return the current commit hash, or "" outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(args) -> dict:
+    """Run every case matching --filter and return the result document."""
+    pattern = re.compile(args.filter) if args.filter else None
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model = functools.cache(lambda: args.model or build_tiny_model(tmp))
+        wanted = pattern.search if pattern else lambda case_id: True
+        for name, params, fn, arg in _cases(model, args.long, wanted):
+            case_id = _case_id(name, params)
+            stats = measure(fn, arg, args.min_time)
+            results.append({"case": case_id, "name": name, "params": params, **stats})
+            print(f"{case_id:70s} {stats['ops_per_s']:12.1f} ops/s  p50 {stats['p50_ms']:9.3f} ms"
+                  f"  p99 {stats['p99_ms']:9.3f} ms", file=sys.stderr)
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "unicode": unicodedata.unidata_version,
+        "model": args.model or "tiny-random-bert",
+        "results": results,
+    }
+
+
+def compare(base_path: str, head_path: str) -> int:
+    """Print per-case p50 and ops/s ratios between two result files."""
+    with open(base_path, encoding="utf-8") as fh:
+        base = {r["case"]: r for r in json.load(fh)["results"]}
+    with open(head_path, encoding="utf-8") as fh:
+        head = {r["case"]: r for r in json.load(fh)["results"]}
+    print(f"{'case':70s} {'base p50':>10s} {'head p50':>10s} {'speedup':>8s}")
+    for case in sorted(base.keys() & head.keys()):
+        b, h = base[case]["p50_ms"], head[case]["p50_ms"]
+        print(f"{case:70s} {b:10.3f} {h:10.3f} {b / h if h else float('inf'):7.2f}x")
+    for case in sorted(base.keys() ^ head.keys()):
+        print(f"{case:70s} only in {'base' if case in base else 'head'}")
+    return 0
+
+
+def main() -> int:
+    """Parse arguments and run or compare benchmarks."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--filter", help="only run cases whose id matches this regex")
+    parser.add_argument(
+        "--model", help="model path or cached Hub ID (default: generated tiny model)"
+    )
+    parser.add_argument(
+        "--long", action="store_true", help="add 200k/2M-char (~50k/500k-token) prompts"
+    )
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to run each case")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASE", "HEAD"), help="compare two result files"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    doc = run(args)
+    payload = json.dumps(doc, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
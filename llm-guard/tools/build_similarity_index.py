@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Build the embedding index used by the EmbeddingSimilarity scanner.
+
+Reads a local JSONL file with one ``{"text": ..., "label": "attack"|"good"}``
+object per line, embeds every text with the same function the scanner uses
+at runtime (similarity.embed), and writes:
+
+    <output>.npy   float32 (rows, dim), L2-normalised; attacks first, then good
+    <output>.json  model, max_length, dim and the number of attack rows
+
+Runs offline if the model is a local path or already in the HF cache.
+
+Usage:
+    python llm-guard/tools/build_similarity_index.py corpus.jsonl /data/known-attacks \\
+        [--model sentence-transformers/all-MiniLM-L6-v2] [--max-length 256] [--batch-size 64]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from similarity import embed, load_encoder  # noqa: E402  pylint: disable=wrong-import-position
+
+_LABELS = ("attack", "good")
+
+
+def read_corpus(path: str) -> tuple:
+    """Return (attack_texts, good_texts) from a JSONL file, dropping exact duplicates."""
+    groups: dict = {label: {} for label in _LABELS}
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            label = row.get("label")
+            if label not in groups:
+                raise ValueError(f"{path}:{lineno}: label must be one of {_LABELS}, got {label!r}")
+            groups[label].setdefault(row["text"], None)
+    return list(groups["attack"]), list(groups["good"])
+
+
+def build(corpus: str, output: str, model: str, max_length: int, batch_size: int):
+    """Embed the corpus and write the index files next to output."""
+    attacks, good = read_corpus(corpus)
+    texts = attacks + good
+    if not texts:
+        raise ValueError(f"{corpus}: no texts")
+    tokenizer, encoder = load_encoder(model)
+
+    rows = []
+    for start in range(0, len(texts), batch_size):
+        rows.append(embed(tokenizer, encoder, texts[start:start + batch_size], max_length))
+        print(f"embedded {min(start + batch_size, len(texts))}/{len(texts)}", file=sys.stderr)
+    vectors = np.concatenate(rows).astype(np.float32)
+
+    meta = {
+        "model": model,
+        "max_length": max_length,
+        "dim": int(vectors.shape[1]),
+        "attacks": len(attacks),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    np.save(f"{output}.npy", vectors)
+    with open(f"{output}.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    print(f"wrote {output}.npy: {len(attacks)} attacks, {len(good)} good, dim {meta['dim']}",
+          file=sys.stderr)
+
+
+def main() -> int:
+    """Parse arguments and build the index."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("corpus", help="JSONL file of {text, label} rows")
+    parser.add_argument("output", help="output path prefix (writes <output>.npy and <output>.json)")
+    parser.add_argument(
+        "--model", default="sentence-transformers/all-MiniLM-L6-v2", help="embedding model"
+    )
+    parser.add_argument("--max-length", type=int, default=256, help="max tokens embedded per text")
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per forward pass")
+    args = parser.parse_args()
+    build(args.corpus, args.output, args.model, args.max_length, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+ONNX backend parity check.
+
+Scores a fixture corpus with the torch backend and with an ONNX backend of
+PromptInjectionScanner and fails if any score drifts by more than the
+tolerance or any verdict flips at the threshold.
+
+Usage:
+    python llm-guard/tools/onnx_parity.py [--model MODEL] [--backend onnx|onnx-int8]
+                                          [--corpus FILE] [--tolerance 0.02]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+# pylint: disable=wrong-import-position
+import config  # noqa: E402
+from scanner_types import PromptInjectionScanner  # noqa: E402
+# pylint: enable=wrong-import-position
+
+_DEFAULT_CORPUS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "parity-corpus.txt"
+)
+
+
+def load_corpus(path: str) -> list:
+    """Return the non-empty, non-comment lines of a corpus file."""
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip() and not line.startswith("#")]
+
+
+def score(model: str, backend: str, texts: list) -> list:
+    """Load a scanner for model/backend and return one injection score per text."""
+    scanner = PromptInjectionScanner(model=model, backend=backend, batch_max_size=1)
+    scanner.load()
+    return [scanner.scan(t).score for t in texts]
+
+
+def main() -> int:
+    """Compare backends on the corpus; return a process exit code."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--model", default=config.DEFAULT_MODEL)
+    parser.add_argument("--backend", default="onnx", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--corpus", default=_DEFAULT_CORPUS)
+    parser.add_argument("--threshold", type=float, default=config.DEFAULT_THRESHOLD)
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+    reference = score(args.model, "torch", texts)
+    candidate = score(args.model, args.backend, texts)
+
+    failures = 0
+    worst = 0.0
+    for text, ref, cand in zip(texts, reference, candidate):
+        drift = abs(ref - cand)
+        worst = max(worst, drift)
+        flipped = (ref >= args.threshold) != (cand >= args.threshold)
+        if drift > args.tolerance or flipped:
+            failures += 1
+            print(f"MISMATCH torch={ref:.4f} {args.backend}={cand:.4f} flipped={flipped}: "
+                  f"{text[:70]}")
+    print(f"{len(texts)} prompts, max drift {worst:.4f}, {failures} mismatches "
+          f"(tolerance {args.tolerance}, threshold {args.threshold})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())